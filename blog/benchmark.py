@@ -0,0 +1,173 @@
+"""
+Synthetic dataset and measurements for `manage.py benchmark_api`.
+"""
+import io
+import random
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from hitcount.models import HitCount
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from tags.models import Tag, TaggedItem
+from .likes import get_like_model
+from .models import Collection, Follow, Post
+from .serializers import FastSimplePostSerializer, SimplePostSerializer
+from .tagging import refresh_tag_counts
+from .urls import router
+
+User = get_user_model()
+
+
+def seed(users=50, posts=500, follows=500, likes=2000, hits=500, tags=20, seed=0, batch_size=500):
+    """
+    Fill the database with a reproducible synthetic dataset and bring every
+    denormalized table (counters, timelines, search index) up to date.
+    """
+    rng = random.Random(seed)
+    password = make_password(None)
+
+    user_objs = User.objects.bulk_create([User(email=f'user{i}@example.com', username=f'user{i}', password=password)
+                                          for i in range(users)], batch_size=batch_size)
+    collections = Collection.objects.bulk_create([Collection(label=f'Collection {i}') for i in range(5)])
+    post_objs = Post.objects.bulk_create([Post(title=f'Post {i} about {rng.choice(["django", "python", "sql", "cache"])}',
+                                               description=f'Description of post {i}',
+                                               content=f'<p>Content of post {i}</p>' * 20,
+                                               is_private=rng.random() < 0.2,
+                                               status=Post.APPROVED,
+                                               owner=rng.choice(user_objs),
+                                               collection=rng.choice(collections))
+                                          for i in range(posts)], batch_size=batch_size)
+
+    pairs = {(rng.choice(user_objs).pk, rng.choice(user_objs).pk) for _ in range(follows)}
+    Follow.objects.bulk_create([Follow(follower_id=follower, following_id=following)
+                                for follower, following in pairs if follower != following],
+                               batch_size=batch_size, ignore_conflicts=True)
+
+    Like = get_like_model()
+    Like.objects.bulk_create([Like(user_id=rng.choice(user_objs).pk, post_id=rng.choice(post_objs).pk)
+                              for _ in range(likes)], batch_size=batch_size, ignore_conflicts=True)
+
+    post_type = ContentType.objects.get_for_model(Post)
+    HitCount.objects.bulk_create([HitCount(content_type=post_type, object_pk=post.pk, hits=rng.randint(1, 1000))
+                                  for post in rng.sample(post_objs, min(hits, len(post_objs)))],
+                                 batch_size=batch_size)
+
+    tag_objs = Tag.objects.bulk_create([Tag(label=f'tag{i}') for i in range(tags)])
+    if tag_objs:
+        TaggedItem.objects.bulk_create([TaggedItem(tag=tag, content_type=post_type, object_id=post.pk)
+                                        for post in post_objs for tag in rng.sample(tag_objs, min(3, len(tag_objs)))],
+                                       batch_size=batch_size)
+        refresh_tag_counts()
+
+    for command in ('reconcile_likes', 'reconcile_follows', 'sync_post_views', 'refresh_popularity', 'rebuild_timelines', 'rebuild_search_index',
+                    'build_suggested_authors', 'build_related_posts'):
+        call_command(command, stdout=io.StringIO())
+
+    return user_objs[0]
+
+
+def get_endpoints(post_id):
+    """
+    (name, url) of every GET route registered on the blog router.
+    """
+    endpoints = []
+    for prefix, viewset, basename in router.registry:
+        if hasattr(viewset, 'list'):
+            endpoints.append((f'{basename}-list', reverse(f'{basename}-list')))
+        if hasattr(viewset, 'retrieve'):
+            endpoints.append((f'{basename}-detail', reverse(f'{basename}-detail', args=[post_id])))
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping:
+                continue
+            name = f'{basename}-{action.url_name}'
+            args = [post_id] if action.detail else []
+            endpoints.append((name, reverse(name, args=args)))
+    return endpoints
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = max(int(round(percent / 100 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+def measure(client, url, iterations=20):
+    """
+    Returns p50/p99 latency in milliseconds and the highest query count of `iterations` GETs.
+    """
+    client.get(url)  # warm up
+    timings = []
+    queries = 0
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = max(queries, len(captured))
+
+    return {
+        'status': response.status_code,
+        'queries': queries,
+        'p50_ms': round(statistics.median(timings), 2),
+        'p99_ms': round(percentile(timings, 99), 2),
+    }
+
+
+def run(user, iterations=20):
+    client = APIClient()
+    client.force_authenticate(user)
+    post_id = Post.objects.filter(is_private=False).order_by('-likes_count').values_list('pk', flat=True).first()
+    return {name: measure(client, url, iterations) for name, url in get_endpoints(post_id)}
+
+
+def compare_serializers(page_sizes=(10, 25, 100, 500), rounds=20):
+    """
+    Median milliseconds to serialize one page of posts with SimplePostSerializer
+    and FastSimplePostSerializer, per page size. Both must give the same output.
+    """
+    request = Request(APIRequestFactory().get('/blog/'))
+    results = {}
+    for page_size in page_sizes:
+        posts = list(Post.objects.select_related('owner', 'collection').order_by('-created_at')[:page_size])
+        # Tags are loaded once per page by the viewsets, not by the serializers.
+        TaggedItem.objects.load_for(posts)
+        timings = {}
+        outputs = {}
+        for name, serializer_class in (('drf', SimplePostSerializer), ('fast', FastSimplePostSerializer)):
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                outputs[name] = serializer_class(posts, many=True, context={'request': request}).data
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = round(statistics.median(samples), 3)
+
+        if [dict(row) for row in outputs['drf']] != outputs['fast']:
+            raise AssertionError(f'FastSimplePostSerializer output differs at page size {page_size}')
+        results[len(posts)] = {**timings, 'speedup': round(timings['drf'] / max(timings['fast'], 1e-6), 1)}
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the regressions of `results` against `baseline` as readable lines.
+    Query counts must not grow, latency may grow by `tolerance` (a ratio).
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if result['queries'] > expected['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries, baseline {expected["queries"]}')
+        if result['p99_ms'] > expected['p99_ms'] * (1 + tolerance):
+            regressions.append(f'{name}: p99 {result["p99_ms"]} ms, baseline {expected["p99_ms"]} ms')
+    return regressions
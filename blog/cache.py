@@ -0,0 +1,150 @@
+"""
+Response caches for the anonymous post lists and the post detail payload.
+
+Logged out clients all get the same page for the same URL, so `list()`
+responses are cached per viewset (``cache_namespace``), host, path and
+query params. Every namespace has a version stamp that the signal handlers
+(and ``like_post()`` / ``unlike_post()``) bump when a ``Post``, a
+``Collection``, a user or a like changes, which makes the previous entries
+unreachable. TTLs come from ``BLOG_CACHE_TTLS`` and the cache alias
+from ``BLOG_CACHE_ALIAS``.
+
+Post detail payloads are cached once per post, ``updated_at`` and owner /
+collection stamp for every viewer; only the per viewer fields are filled in
+on each request.
+"""
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+from .conditional import check_not_modified, get_related_stamp, set_validators
+
+KEY_PREFIX = 'blog:response'
+
+# Which cached lists have to be dropped when a model changes.
+INVALIDATED_BY = {
+    'post': ('posts', 'popular'),
+    'like': ('posts', 'popular'),
+    'user': ('posts', 'popular'),
+    'collection': ('posts', 'popular', 'collections', 'post'),
+    'taggeditem': ('posts', 'popular'),
+}
+
+# Detail fields that differ per viewer or change without touching updated_at.
+PER_VIEWER_FIELDS = ('views', 'likes_count', 'liked_status')
+
+
+def get_cache():
+    return caches[getattr(settings, 'BLOG_CACHE_ALIAS', 'default')]
+
+
+def get_ttl(namespace):
+    return getattr(settings, 'BLOG_CACHE_TTLS', {}).get(namespace, 60)
+
+
+def get_version(namespace):
+    cache = get_cache()
+    version_key = f'{KEY_PREFIX}:{namespace}:version'
+    version = cache.get(version_key)
+    if version is None:
+        cache.add(version_key, uuid.uuid4().hex, None)
+        version = cache.get(version_key)
+    return version
+
+
+def invalidate(*namespaces):
+    cache = get_cache()
+    for namespace in namespaces:
+        cache.set(f'{KEY_PREFIX}:{namespace}:version', uuid.uuid4().hex, None)
+
+
+def invalidate_for(model_name):
+    invalidate(*INVALIDATED_BY.get(model_name, ()))
+
+
+def make_key(namespace, request):
+    params = sorted(request.query_params.lists())
+    url = f'{request.get_host()}{request.path}?{params}'
+    digest = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+    return f'{KEY_PREFIX}:{namespace}:{get_version(namespace)}:{digest}'
+
+
+def record(namespace, outcome):
+    cache = get_cache()
+    counter_key = f'{KEY_PREFIX}:{namespace}:{outcome}'
+    if not cache.add(counter_key, 1, None):
+        try:
+            cache.incr(counter_key)
+        except ValueError:
+            cache.set(counter_key, 1, None)
+
+
+def get_stats(*namespaces):
+    """
+    Hit and miss counters per namespace, e.g. {'posts': {'hits': 3, 'misses': 1}}.
+    """
+    cache = get_cache()
+    namespaces = namespaces or sorted({namespace for names in INVALIDATED_BY.values() for namespace in names})
+    return {namespace: {'hits': cache.get(f'{KEY_PREFIX}:{namespace}:hits', 0),
+                        'misses': cache.get(f'{KEY_PREFIX}:{namespace}:misses', 0)}
+            for namespace in namespaces}
+
+
+def get_post_payload(post, serializer_class, context):
+    """
+    Serialized `post`, with the shared part rendered at most once per version
+    of the post and the per viewer fields read from `post` itself.
+    """
+    cache = get_cache()
+    request = context['request']
+    stamp = hashlib.md5(get_related_stamp(post).encode(), usedforsecurity=False).hexdigest()
+    key = f'{KEY_PREFIX}:post:{get_version("post")}:{request.get_host()}:{post.pk}:{post.updated_at.timestamp()}:{stamp}'
+    shared = cache.get(key)
+    if shared is None:
+        data = serializer_class(post, context=context).data
+        shared = {field: value for field, value in data.items() if field not in PER_VIEWER_FIELDS}
+        cache.set(key, shared, get_ttl('post'))
+
+    per_viewer = {
+        'views': post.views_count,
+        'likes_count': post.likes_count,
+        'liked_status': getattr(post, 'liked', False) is True,
+    }
+    return {field: shared[field] if field in shared else per_viewer[field]
+            for field in serializer_class.Meta.fields}
+
+
+class AnonymousListCacheMixin:
+    """
+    Serve `list()` from the cache for anonymous GET requests.
+    """
+    cache_namespace = None
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated or not getattr(settings, 'BLOG_CACHE_ENABLED', True):
+            return super().list(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = make_key(self.cache_namespace, request)
+        cached = cache.get(key)
+        if cached is not None:
+            record(self.cache_namespace, 'hits')
+            etag, last_modified = cached['etag'], cached['last_modified']
+            if etag is not None:
+                not_modified = check_not_modified(request, etag, last_modified)
+                if not_modified is not None:
+                    return not_modified
+            response = Response(cached['data'], headers={'X-Cache': 'HIT'})
+            return set_validators(response, etag, last_modified) if etag is not None else response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, {'data': response.data,
+                            'etag': response.get('ETag'),
+                            'last_modified': parse_http_date_safe(response.get('Last-Modified'))},
+                      get_ttl(self.cache_namespace))
+        record(self.cache_namespace, 'misses')
+        response['X-Cache'] = 'MISS'
+        return response
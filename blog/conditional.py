@@ -0,0 +1,77 @@
+"""
+Conditional GET (ETag / Last-Modified) for the post endpoints.
+
+Validators are derived from columns already loaded with the posts
+(``updated_at``, ``likes_count``, ``views_count``) and with their selected
+owner and collection, so a 304 is returned before anything is serialized.
+"""
+import hashlib
+import json
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def get_related_stamp(post):
+    """
+    The owner and collection fields rendered with `post`. Renaming them does
+    not move the post's `updated_at`.
+    """
+    owner, collection = post.owner, post.collection
+    renditions = json.dumps(owner.profile_picture_renditions, sort_keys=True)
+    return f'{owner.username}:{owner.profile_picture.name}:{renditions}:{collection and collection.label}'
+
+
+def get_validators(posts, *extra):
+    """
+    Returns the (etag, last_modified) pair for a list of posts.
+    `extra` values (e.g. pagination links or viewer state) are mixed into the etag.
+    """
+    parts = [f'{post.pk}:{post.updated_at.timestamp()}:{post.likes_count}:{post.views_count}:{get_related_stamp(post)}'
+             for post in posts]
+    parts.extend(str(value) for value in extra)
+    etag = quote_etag(hashlib.md5('|'.join(parts).encode(), usedforsecurity=False).hexdigest())
+    last_modified = max((post.updated_at for post in posts), default=None)
+    # HTTP dates have a one second resolution.
+    return etag, last_modified and int(last_modified.timestamp())
+
+
+def check_not_modified(request, etag, last_modified):
+    """
+    Returns a 304 response when the client copy is still fresh, None otherwise.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    return get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class ConditionalListMixin:
+    """
+    `list()` answering 304 when the page of posts did not change.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        posts = page if page is not None else list(queryset)
+
+        links = (self.paginator.get_next_link(), self.paginator.get_previous_link()) if page is not None else ()
+        etag, last_modified = get_validators(posts, *links)
+        not_modified = check_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        serializer = self.get_serializer(posts, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return set_validators(response, etag, last_modified)
@@ -1,18 +1,54 @@
-from django_filters.rest_framework import FilterSet
-from .models import Post
+from django.contrib.contenttypes.models import ContentType
+from django_filters.rest_framework import CharFilter, FilterSet, NumberFilter
+from rest_framework.filters import SearchFilter
+from tags.models import Tag, TaggedItem
+from .models import Post, SavedPost
+from .pagination import PostCursorPagination
+from .search import get_search_backend
 
 class PostFilter(FilterSet):
+    tag = CharFilter(method='filter_tag', label='Tag label')
+
     class Meta:
         model = Post
         fields = {
             'collection': ['exact']
         }
 
-class OwnPostFilter(FilterSet):
+    def filter_tag(self, queryset, name, value):
+        # Passing the tag ids as values lets the semi-join use tags_taggeditem_tag_ct_idx.
+        tag_ids = list(Tag.objects.filter(label=value).values_list('pk', flat=True))
+        tagged = TaggedItem.objects \
+            .filter(tag_id__in=tag_ids, content_type=ContentType.objects.get_for_model(Post)) \
+            .values('object_id')
+        return queryset.filter(pk__in=tagged)
+
+class OwnPostFilter(PostFilter):
     class Meta:
         model = Post
         fields = {
             'collection': ['exact'],
             'status': ['exact'],
             'is_private': ['exact']
-        }    
\ No newline at end of file
+        }
+
+
+class SavedPostFilter(FilterSet):
+    collection = NumberFilter(field_name='post__collection')
+
+    class Meta:
+        model = SavedPost
+        fields = ['collection']
+
+
+class PostSearchFilter(SearchFilter):
+    """
+    Full-text search on the `search` query param, ranked by relevance
+    through the `search_rank` annotation.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_terms = self.get_search_terms(request)
+        if not search_terms:
+            return queryset
+        return get_search_backend().search(queryset, search_terms).order_by(*PostCursorPagination.search_ordering)
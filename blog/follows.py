@@ -0,0 +1,99 @@
+"""
+Follow graph: follow/unfollow, follow lists ordered by follow time, mutual
+follows and relationship checks for a whole page of users.
+
+``User.followers_count`` and ``User.following_count`` are kept up to date
+through ``F()`` updates by the Follow signals, in the transaction that
+writes the Follow row. Bulk writes skip the signals, call
+``refresh_follow_counts()`` after them.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import Follow
+
+
+def follow(follower_id, following_id):
+    """
+    Returns the new Follow, or None if `follower_id` already follows `following_id`.
+    """
+    try:
+        with transaction.atomic():
+            return Follow.objects.create(follower_id=follower_id, following_id=following_id)
+    except IntegrityError:
+        return None
+
+
+def unfollow(follower_id, following_id):
+    """
+    Returns False if `follower_id` did not follow `following_id`.
+    """
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(follower_id=follower_id, following_id=following_id).delete()
+    return bool(deleted)
+
+
+def get_followings(user):
+    """
+    Follows of `user`, latest first, with the followed user selected.
+    """
+    return Follow.objects.filter(follower=user).select_related('following').order_by('-created_at', '-id')
+
+
+def get_followers(user):
+    """
+    Follows of `user` by others, latest first, with the follower selected.
+    """
+    return Follow.objects.filter(following=user).select_related('follower').order_by('-created_at', '-id')
+
+
+def get_mutuals(user):
+    """
+    Follows of `user` that are followed back, latest first.
+    """
+    return get_followings(user).filter(following__in=Follow.objects.filter(following=user).values('follower'))
+
+
+def get_relationships(user, user_ids):
+    """
+    Returns the ids among `user_ids` that `user` follows and the ids among
+    them that follow `user`, as two sets, in one query.
+    """
+    following_ids, follower_ids = set(), set()
+    if not user.is_authenticated or not user_ids:
+        return following_ids, follower_ids
+
+    for follower_id, following_id in Follow.objects \
+            .filter(Q(follower=user, following_id__in=user_ids) | Q(following=user, follower_id__in=user_ids)) \
+            .values_list('follower_id', 'following_id'):
+        if follower_id == user.pk:
+            following_ids.add(following_id)
+        else:
+            follower_ids.add(follower_id)
+    return following_ids, follower_ids
+
+
+def _count_follows(field):
+    return Coalesce(Subquery(Follow.objects
+                             .filter(**{field: OuterRef('pk')})
+                             .order_by()
+                             .values(field)
+                             .annotate(total=Count('pk'))
+                             .values('total')), Value(0))
+
+
+def get_actual_counts():
+    """
+    Expressions counting the Follow rows of a user, by counter field.
+    """
+    return {'followers_count': _count_follows('following'), 'following_count': _count_follows('follower')}
+
+
+def refresh_follow_counts(user_ids=None):
+    """
+    Recount `followers_count` and `following_count` from Follow.
+    """
+    User = get_user_model()
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    return users.update(**get_actual_counts())
@@ -0,0 +1,213 @@
+"""
+Write-behind hit counting for post detail views.
+
+With ``BLOG_HITS_BUFFERED`` enabled the detail view only appends the visit to
+an in-process buffer. The buffer is flushed every ``BLOG_HITS_FLUSH_INTERVAL``
+seconds (or as soon as it holds ``BLOG_HITS_BUFFER_SIZE`` visits) and the
+flush applies hitcount's rules in bulk: blacklisted IPs and user agents,
+excluded user groups, the per IP limit and the ``HITCOUNT_KEEP_HIT_ACTIVE``
+window per user (or per session for anonymous visitors).
+"""
+import atexit
+import threading
+from collections import Counter, defaultdict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from hitcount.models import BlacklistIP, BlacklistUserAgent, Hit, HitCount
+from hitcount.utils import get_ip
+from core.loaders import load_generic_related
+from .models import Post
+from .ranking import refresh_popularity
+
+PendingHit = namedtuple('PendingHit', 'post_id session ip user_agent user_id')
+
+
+def buffering_enabled():
+    return getattr(settings, 'BLOG_HITS_BUFFERED', False)
+
+
+def load_hit_counts(posts, to_attr='hitcount'):
+    """
+    Attach the HitCount of every post of `posts` (None if it has never been
+    viewed) as `to_attr`, in one query.
+    """
+    return load_generic_related(posts, HitCount.objects.all(), to_attr, fk_field='object_pk', many=False)
+
+
+class HitBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._seen = set()
+        self._timer = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'BLOG_HITS_FLUSH_INTERVAL', 10)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'BLOG_HITS_BUFFER_SIZE', 1000)
+
+    def record(self, request, post_id):
+        """
+        Queue a visit of `post_id` by the client behind `request`.
+        Returns False when the same visitor is already waiting in the buffer.
+        """
+        # Same as hitcount: empty sessions are not saved by Django.
+        if request.session.session_key is None:
+            request.session.save()
+
+        user_id = request.user.pk if request.user.is_authenticated else None
+        hit = PendingHit(post_id=post_id,
+                         session=request.session.session_key,
+                         ip=get_ip(request),
+                         user_agent=request.headers.get('User-Agent', '')[:255],
+                         user_id=user_id)
+        visitor = ('user', user_id) if user_id else ('session', hit.session)
+
+        with self._lock:
+            if (post_id, visitor) in self._seen:
+                return False
+            self._seen.add((post_id, visitor))
+            self._pending.append(hit)
+            full = len(self._pending) >= self.max_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+        if full:
+            self.flush()
+        return True
+
+    def flush(self):
+        """
+        Apply every buffered visit to the database and return how many hits
+        were counted.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._seen = set()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if not pending:
+            return 0
+        return apply_hits(pending)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            connections.close_all()
+
+
+def apply_hits(pending):
+    """
+    Count `pending` visits with hitcount's semantics using a constant number
+    of queries, and bump `HitCount.hits` and `Post.views_count` accordingly.
+    """
+    pending = _exclude_blocked(pending)
+    if not pending:
+        return 0
+
+    with transaction.atomic():
+        hitcounts = _get_hitcounts({hit.post_id for hit in pending})
+        active = Hit.objects.filter_active(hitcount__in=hitcounts.values())
+
+        seen_users = set(active.filter(user_id__in={hit.user_id for hit in pending if hit.user_id})
+                         .values_list('hitcount__object_pk', 'user_id'))
+        seen_sessions = set(active.filter(session__in={hit.session for hit in pending if not hit.user_id})
+                            .values_list('hitcount__object_pk', 'session'))
+
+        hits_per_ip_limit = getattr(settings, 'HITCOUNT_HITS_PER_IP_LIMIT', 0)
+        hits_per_ip = Counter()
+        if hits_per_ip_limit:
+            # Like hitcount, an IP's active hits on every object count towards the limit.
+            hits_per_ip.update(dict(Hit.objects.filter_active(ip__in={hit.ip for hit in pending})
+                                    .order_by()
+                                    .values_list('ip')
+                                    .annotate(total=Count('pk'))))
+
+        new_hits = []
+        for hit in pending:
+            if hits_per_ip_limit and hits_per_ip[hit.ip] >= hits_per_ip_limit:
+                continue
+
+            if hit.user_id:
+                key, seen = (hit.post_id, hit.user_id), seen_users
+            else:
+                key, seen = (hit.post_id, hit.session), seen_sessions
+            if key in seen:
+                continue
+
+            seen.add(key)
+            hits_per_ip[hit.ip] += 1
+            new_hits.append(Hit(session=hit.session, ip=hit.ip, user_agent=hit.user_agent,
+                                user_id=hit.user_id, hitcount=hitcounts[hit.post_id]))
+
+        # bulk_create skips Hit.save(), which is what normally increments HitCount.
+        Hit.objects.bulk_create(new_hits)
+        _increment(Counter(hit.hitcount.object_pk for hit in new_hits), hitcounts)
+
+    return len(new_hits)
+
+
+def _exclude_blocked(pending):
+    blocked_ips = set(BlacklistIP.objects
+                      .filter(ip__in={hit.ip for hit in pending})
+                      .values_list('ip', flat=True))
+    blocked_agents = set(BlacklistUserAgent.objects
+                         .filter(user_agent__in={hit.user_agent for hit in pending})
+                         .values_list('user_agent', flat=True))
+
+    excluded_users = set()
+    exclude_user_group = getattr(settings, 'HITCOUNT_EXCLUDE_USER_GROUP', None)
+    if exclude_user_group:
+        excluded_users = set(get_user_model().objects
+                             .filter(pk__in={hit.user_id for hit in pending if hit.user_id},
+                                     groups__name__in=exclude_user_group)
+                             .values_list('pk', flat=True))
+
+    return [hit for hit in pending
+            if hit.ip not in blocked_ips
+            and hit.user_agent not in blocked_agents
+            and hit.user_id not in excluded_users]
+
+
+def _get_hitcounts(post_ids):
+    content_type = ContentType.objects.get_for_model(Post)
+    hitcounts = HitCount.objects.filter(content_type=content_type, object_pk__in=post_ids)
+    missing = set(post_ids) - set(hitcounts.values_list('object_pk', flat=True))
+    if missing:
+        HitCount.objects.bulk_create([HitCount(content_type=content_type, object_pk=post_id) for post_id in missing],
+                                     ignore_conflicts=True)
+    return {hitcount.object_pk: hitcount for hitcount in hitcounts.all()}
+
+
+def _increment(counts, hitcounts):
+    # One UPDATE per distinct increment instead of one per post.
+    by_amount = defaultdict(list)
+    for post_id, amount in counts.items():
+        by_amount[amount].append(post_id)
+
+    for amount, post_ids in by_amount.items():
+        HitCount.objects.filter(pk__in=[hitcounts[post_id].pk for post_id in post_ids]) \
+            .update(hits=F('hits') + amount, modified=timezone.now())
+        Post.objects.filter(pk__in=post_ids).update(views_count=F('views_count') + amount)
+
+    refresh_popularity(list(counts))
+
+
+hit_buffer = HitBuffer()
+atexit.register(hit_buffer.flush)
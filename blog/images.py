@@ -0,0 +1,142 @@
+"""
+Resized renditions of uploaded images (post thumbnails, profile pictures).
+
+After an upload, the `render_renditions` task renders every size of
+``BLOG_IMAGE_RENDITIONS`` in every format of ``BLOG_IMAGE_FORMATS``. The
+file names and dimensions are stored in a JSON field next to the image::
+
+    {"source": "blogs/thumbnail/a.png",
+     "small": {"webp": {"name": "...", "width": 320, "height": 180}, "jpeg": {...}}}
+
+Serializers read that field through `get_rendition_url()` so list responses
+link the small rendition instead of the original.
+"""
+import io
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps
+from . import cache
+
+# Pillow format name and file extension per configured format.
+FORMATS = {
+    'webp': ('WEBP', 'webp'),
+    'jpeg': ('JPEG', 'jpg'),
+}
+
+def get_sizes():
+    return getattr(settings, 'BLOG_IMAGE_RENDITIONS', {'small': (320, 320), 'medium': (960, 960)})
+
+
+def get_formats():
+    return getattr(settings, 'BLOG_IMAGE_FORMATS', ('webp', 'jpeg'))
+
+
+def render(image, size, image_format):
+    """
+    Returns (bytes, width, height) of `image` shrunk to fit in `size`.
+    """
+    pil_format, _ = FORMATS[image_format]
+    copy = image.copy()
+    copy.thumbnail(size, Image.LANCZOS)
+    if pil_format == 'JPEG' and copy.mode != 'RGB':
+        copy = copy.convert('RGB')
+    elif copy.mode not in ('RGB', 'RGBA'):
+        copy = copy.convert('RGBA')
+
+    output = io.BytesIO()
+    copy.save(output, pil_format, quality=getattr(settings, 'BLOG_IMAGE_QUALITY', 80), optimize=True)
+    return output.getvalue(), copy.width, copy.height
+
+
+def create_renditions(field_file):
+    storage = field_file.storage
+    root, _ = os.path.splitext(field_file.name)
+    directory, filename = os.path.split(root)
+
+    with field_file.open('rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    renditions = {'source': field_file.name}
+    for size_name, size in get_sizes().items():
+        renditions[size_name] = {}
+        for image_format in get_formats():
+            content, width, height = render(image, size, image_format)
+            name = storage.save(f'{directory}/renditions/{filename}.{size_name}.{FORMATS[image_format][1]}',
+                                ContentFile(content))
+            renditions[size_name][image_format] = {'name': name, 'width': width, 'height': height}
+    return renditions
+
+
+def delete_renditions(storage, renditions):
+    for size_name, formats in renditions.items():
+        if size_name == 'source':
+            continue
+        for rendition in formats.values():
+            storage.delete(rendition['name'])
+
+
+def process(model, pk, field_name, renditions_field):
+    """
+    Render the renditions of `field_name` of one row and store them, unless
+    the image was replaced in the meantime.
+    """
+    instance = model.objects.filter(pk=pk).only(field_name, renditions_field).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, field_name)
+    previous = getattr(instance, renditions_field) or {}
+
+    renditions = create_renditions(field_file) if field_file else {}
+    changes = {renditions_field: renditions}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        # Moves the ETag / Last-Modified of the post on.
+        changes['updated_at'] = timezone.now()
+
+    if field_file:
+        unchanged = Q(**{field_name: field_file.name})
+    else:
+        unchanged = Q(**{field_name: ''}) | Q(**{f'{field_name}__isnull': True})
+
+    if model.objects.filter(unchanged, pk=pk).update(**changes):
+        delete_renditions(field_file.storage, previous)
+        cache.invalidate_for('post')
+    else:
+        delete_renditions(field_file.storage, renditions)
+
+
+def needs_renditions(instance, field_name, renditions_field):
+    """
+    Whether the image of `instance` changed since its renditions were rendered.
+    """
+    if field_name in instance.get_deferred_fields():
+        return False
+    field_file = getattr(instance, field_name)
+    renditions = getattr(instance, renditions_field) or {}
+    return (field_file.name or None) != renditions.get('source')
+
+
+def get_rendition(renditions, size_name):
+    """
+    The stored rendition of `size_name` in the first available configured format.
+    """
+    formats = (renditions or {}).get(size_name) or {}
+    for image_format in get_formats():
+        if image_format in formats:
+            return formats[image_format]
+    return None
+
+
+def get_rendition_url(field_file, renditions, size_name, request=None):
+    """
+    URL of the `size_name` rendition of `field_file`, or of the original while
+    no rendition exists yet.
+    """
+    if not field_file:
+        return None
+    rendition = get_rendition(renditions, size_name)
+    url = field_file.storage.url(rendition['name']) if rendition else field_file.url
+    return request.build_absolute_uri(url) if request is not None else url
@@ -0,0 +1,59 @@
+"""
+Like/unlike operations that only ever touch ``Post.likes_count`` (and the
+popularity it gives) through ``F()`` updates, so concurrent requests can not
+lose each other's counts.
+"""
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from . import cache
+from .models import Post
+from .ranking import get_counter_changes, get_gravity
+from .tasks import refresh_post_popularity
+
+
+def get_like_model():
+    return get_user_model().liked_posts.through
+
+
+def like_post(user, post_id):
+    """
+    Like `post_id` as `user`. Returns False if the user already liked it.
+    """
+    Like = get_like_model()
+    try:
+        with transaction.atomic():
+            Like.objects.create(user_id=user.pk, post_id=post_id)
+            Post.objects.filter(pk=post_id).update(**get_counter_changes(likes_count=F('likes_count') + 1))
+            if get_gravity():
+                refresh_post_popularity.delay_once(post_ids=[post_id])
+    except IntegrityError:
+        return False
+    cache.invalidate_for('like')
+    return True
+
+
+def unlike_post(user, post_id):
+    """
+    Remove the like of `user` on `post_id`. Returns False if there was none.
+    """
+    with transaction.atomic():
+        deleted, _ = get_like_model().objects.filter(user_id=user.pk, post_id=post_id).delete()
+        if deleted:
+            Post.objects.filter(pk=post_id, likes_count__gt=0) \
+                .update(**get_counter_changes(likes_count=F('likes_count') - 1))
+            if get_gravity():
+                refresh_post_popularity.delay_once(post_ids=[post_id])
+    if deleted:
+        cache.invalidate_for('like')
+    return bool(deleted)
+
+
+def toggle_like(user, post_id):
+    """
+    Like the post if `user` did not like it yet, unlike it otherwise.
+    Returns the new liked state.
+    """
+    if unlike_post(user, post_id):
+        return False
+    return like_post(user, post_id)
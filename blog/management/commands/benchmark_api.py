@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from blog import benchmark
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / 'benchmark_baseline.json'
+
+
+class Command(BaseCommand):
+    help = ('Seed a synthetic dataset in a throwaway test database and measure p50/p99 latency '
+            'and SQL query counts of every GET endpoint of the blog router.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--follows', type=int, default=500)
+        parser.add_argument('--likes', type=int, default=2000)
+        parser.add_argument('--hits', type=int, default=500)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save-baseline', action='store_true', help='Store the results as the new baseline.')
+        parser.add_argument('--check', action='store_true', help='Fail when results regress against the baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed p99 latency growth over the baseline, as a ratio.')
+        parser.add_argument('--serializers', action='store_true',
+                            help='Also compare SimplePostSerializer with FastSimplePostSerializer on large pages.')
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = benchmark.seed(users=options['users'], posts=options['posts'], follows=options['follows'],
+                                  likes=options['likes'], hits=options['hits'], tags=options['tags'],
+                                  seed=options['seed'])
+            results = benchmark.run(user, iterations=options['iterations'])
+            serializers = benchmark.compare_serializers(rounds=options['iterations']) if options['serializers'] else None
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'{"endpoint":<40}{"status":>8}{"queries":>9}{"p50 ms":>10}{"p99 ms":>10}')
+        for name, result in results.items():
+            self.stdout.write(f'{name:<40}{result["status"]:>8}{result["queries"]:>9}'
+                              f'{result["p50_ms"]:>10}{result["p99_ms"]:>10}')
+
+        if serializers is not None:
+            self.stdout.write(f'\n{"page size":<40}{"drf ms":>10}{"fast ms":>10}{"speedup":>10}')
+            for page_size, result in serializers.items():
+                self.stdout.write(f'{page_size:<40}{result["drf"]:>10}{result["fast"]:>10}{result["speedup"]:>9}x')
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Baseline saved to {baseline_path}.'))
+
+        if options['check']:
+            if not baseline_path.exists():
+                raise CommandError(f'No baseline at {baseline_path}, run with --save-baseline first.')
+            regressions = benchmark.compare(results, json.loads(baseline_path.read_text()), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
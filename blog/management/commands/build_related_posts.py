@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.related import build_related
+
+
+class Command(BaseCommand):
+    help = ('Recompute the /blog/detail/<pk>/related/ posts of the posts changed since the last run '
+            'and of their neighbours, or of every post with --full.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every post.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Compute the related posts without storing them.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def report(posts, related):
+            self.stdout.write(f'{posts} posts, {related} related posts')
+
+        posts, related = build_related(full=options['full'], batch_size=options['batch_size'],
+                                       dry_run=options['dry_run'], on_batch=report)
+
+        verb = 'computed' if options['dry_run'] else 'stored'
+        self.stdout.write(self.style.SUCCESS(f'{related} related posts for {posts} posts {verb} '
+                                             f'in {time.perf_counter() - start:.1f}s.'))
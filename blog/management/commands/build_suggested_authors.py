@@ -0,0 +1,24 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.suggestions import build_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute the /users/suggested/ authors of every user from the follow graph and likes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Compute the suggestions without storing them.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+
+        def report(users, suggestions):
+            self.stdout.write(f'{users} users, {suggestions} suggestions')
+
+        users, suggestions = build_suggestions(batch_size=options['batch_size'], dry_run=options['dry_run'],
+                                               on_batch=report)
+
+        verb = 'computed' if options['dry_run'] else 'stored'
+        self.stdout.write(self.style.SUCCESS(f'{suggestions} suggestions for {users} users {verb} '
+                                             f'in {time.perf_counter() - start:.1f}s.'))
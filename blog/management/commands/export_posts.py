@@ -0,0 +1,30 @@
+import time
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.transfer import export_posts
+
+
+class Command(BaseCommand):
+    help = 'Export posts with their authors, collections and tags as JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='File to write, "-" for stdout.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--owner', help='Only export the posts of the user with this email.')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.all()
+        if options['owner']:
+            queryset = queryset.filter(owner__email=options['owner'])
+
+        start = time.perf_counter()
+        if options['output'] == '-':
+            exported = export_posts(self.stdout, queryset, options['batch_size'])
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                exported = export_posts(stream, queryset, options['batch_size'])
+        elapsed = time.perf_counter() - start
+
+        # Keep stdout clean for the JSONL when exporting to it.
+        self.stderr.write(self.style.SUCCESS(f'{exported} posts exported in {elapsed:.1f}s '
+                                             f'({exported / max(elapsed, 1e-9):.0f} posts/s).'))
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from blog import images
+from blog.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Render the missing (or with --force, all) renditions of post thumbnails and profile pictures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Render again images that already have renditions.')
+        parser.add_argument('--workers', type=int, default=2)
+
+    def handle(self, *args, **options):
+        targets = (
+            (Post, 'thumbnail', 'thumbnail_renditions'),
+            (get_user_model(), 'profile_picture', 'profile_picture_renditions'),
+        )
+
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite has one writer at a time: more threads only fail with "database table is locked".
+            workers = 1
+
+        def render(job):
+            try:
+                images.process(*job)
+            finally:
+                close_old_connections()
+
+        def render_all(jobs):
+            if workers == 1:
+                for job in jobs:
+                    images.process(*job)
+            else:
+                list(executor.map(render, jobs))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for model, field_name, renditions_field in targets:
+                jobs = [(model, pk, field_name, renditions_field)
+                        for pk, name, renditions in model.objects
+                            .exclude(**{field_name: ''})
+                            .exclude(**{f'{field_name}__isnull': True})
+                            .values_list('pk', field_name, renditions_field)
+                            .iterator()
+                        if options['force'] or (renditions or {}).get('source') != name]
+                render_all(jobs)
+                self.stdout.write(f'{len(jobs)} {model._meta.verbose_name_plural} rendered.')
+
+        self.stdout.write(self.style.SUCCESS('Renditions are up to date.'))
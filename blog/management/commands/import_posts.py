@@ -0,0 +1,40 @@
+import sys
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from blog.transfer import PostImporter
+
+
+class Command(BaseCommand):
+    help = 'Import posts with their authors, collections and tags from JSONL (see blog/transfer.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', nargs='?', default='-', help='File to read, "-" for stdin.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--keep-ids', action='store_true',
+                            help='Keep the exported post ids, updating the posts that already exist.')
+
+    def handle(self, *args, **options):
+        importer = PostImporter(batch_size=options['batch_size'], keep_ids=options['keep_ids'])
+        start = time.perf_counter()
+
+        def report(importer):
+            total = importer.created + importer.updated
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{total} posts imported ({total / max(elapsed, 1e-9):.0f} posts/s)')
+
+        try:
+            if options['input'] == '-':
+                importer.run(sys.stdin, on_batch=report)
+            else:
+                with open(options['input'], encoding='utf-8') as stream:
+                    importer.run(stream, on_batch=report)
+        except (KeyError, ValueError) as e:
+            raise CommandError(f'Invalid record: {e}')
+        except IntegrityError as e:
+            raise CommandError(f'Invalid record, the batch was rolled back: {e}')
+
+        elapsed = time.perf_counter() - start
+        total = importer.created + importer.updated
+        self.stdout.write(self.style.SUCCESS(f'{importer.created} posts created, {importer.updated} updated '
+                                             f'in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} posts/s).'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from blog import timeline
+from blog.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized /blog/followed/ timelines from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', action='store_true', help='Keep existing entries and only add missing ones.')
+
+    def handle(self, *args, **options):
+        if not options['keep']:
+            TimelineEntry.objects.all().delete()
+
+        follows = 0
+        for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id').iterator():
+            timeline.add_following(follower_id, following_id)
+            follows += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{follows} follows replayed, {TimelineEntry.objects.count()} timeline entries.'))
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from blog.follows import get_actual_counts, refresh_follow_counts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recompute User.followers_count and User.following_count from the follows table to repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the users that drifted.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual_counts = get_actual_counts()
+        last_pk = 0
+        checked = updated = 0
+
+        while True:
+            pks = list(User.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            drifted = list(User.objects
+                           .filter(pk__in=pks)
+                           .annotate(actual_followers=actual_counts['followers_count'],
+                                     actual_following=actual_counts['following_count'])
+                           .exclude(followers_count=F('actual_followers'), following_count=F('actual_following'))
+                           .values_list('pk', flat=True))
+
+            # The counts are taken inside the UPDATE so follows landing meanwhile are not lost.
+            if drifted and not options['dry_run']:
+                refresh_follow_counts(drifted)
+
+            checked += len(pks)
+            updated += len(drifted)
+
+        verb = 'would be updated' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{checked} users checked, {updated} {verb}.'))
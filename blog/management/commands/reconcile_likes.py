@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from blog.likes import get_like_model
+from blog.models import Post
+from blog.ranking import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.likes_count from the liked posts table to repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the posts that drifted.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        actual_likes = Coalesce(Subquery(get_like_model().objects
+                                         .filter(post_id=OuterRef('pk'))
+                                         .order_by()
+                                         .values('post_id')
+                                         .annotate(total=Count('pk'))
+                                         .values('total')), Value(0))
+        last_pk = 0
+        checked = updated = 0
+
+        while True:
+            pks = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            drifted = list(Post.objects
+                           .filter(pk__in=pks)
+                           .annotate(actual_likes=actual_likes)
+                           .exclude(likes_count=F('actual_likes'))
+                           .values_list('pk', flat=True))
+
+            # The count is taken inside the UPDATE so likes landing meanwhile are not lost.
+            if drifted and not options['dry_run']:
+                Post.objects.filter(pk__in=drifted).update(likes_count=actual_likes)
+                refresh_popularity(drifted)
+
+            checked += len(pks)
+            updated += len(drifted)
+
+        verb = 'would be updated' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{checked} posts checked, {updated} {verb}.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from blog.models import Post
+from blog.ranking import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute Post.popularity for every post, e.g. to apply time decay.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = updated = 0
+
+        while True:
+            pks = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            updated += refresh_popularity(pks)
+            checked += len(pks)
+
+        self.stdout.write(self.style.SUCCESS(f'{checked} posts checked, {updated} updated.'))
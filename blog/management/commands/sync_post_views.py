@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from blog.hits import load_hit_counts
+from blog.models import Post
+from blog.ranking import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Backfill and reconcile Post.views_count from the hitcount tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only report the posts that drifted.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        checked = updated = 0
+
+        while True:
+            posts = list(Post.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'views_count')[:batch_size])
+            if not posts:
+                break
+            last_pk = posts[-1].pk
+
+            load_hit_counts(posts)
+
+            changed = []
+            for post in posts:
+                views_count = post.hitcount.hits if post.hitcount is not None else 0
+                if post.views_count != views_count:
+                    post.views_count = views_count
+                    changed.append(post)
+
+            if changed and not options['dry_run']:
+                Post.objects.bulk_update(changed, ['views_count'], batch_size=batch_size)
+                refresh_popularity([post.pk for post in changed])
+
+            checked += len(posts)
+            updated += len(changed)
+
+        verb = 'would be updated' if options['dry_run'] else 'updated'
+        self.stdout.write(self.style.SUCCESS(f'{checked} posts checked, {updated} {verb}.'))
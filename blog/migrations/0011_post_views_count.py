@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-17 09:59
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def copy_hit_counts(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    HitCount = apps.get_model('hitcount', 'HitCount')
+    Post = apps.get_model('blog', 'Post')
+
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if content_type is None:
+        return
+    # object_pk is text in some django-hitcount versions, compare it in its own type.
+    object_pk = type(HitCount._meta.get_field('object_pk'))()
+    Post.objects.update(views_count=Coalesce(Subquery(HitCount.objects
+                                                      .filter(content_type=content_type,
+                                                              object_pk=Cast(OuterRef('pk'), object_pk))
+                                                      .values('hits')[:1]), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_follow'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('hitcount', '0004_auto_20200704_0933'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(copy_hit_counts, migrations.RunPython.noop),
+    ]
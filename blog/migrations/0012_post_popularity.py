@@ -0,0 +1,34 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+
+def compute_initial_popularity(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    # views_count is already copied from HitCount by 0011.
+    Post.objects.filter(views_count__gt=0) \
+        .update(popularity=Cast('likes_count', FloatField()) / Cast('views_count', FloatField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0011_post_views_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='popularity',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-popularity', '-post_id'], name='blog_post_popularity_idx'),
+        ),
+        migrations.RunPython(compute_initial_popularity, migrations.RunPython.noop),
+    ]
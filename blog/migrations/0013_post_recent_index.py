@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_post_popularity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-created_at', '-updated_at', 'post_id'], name='blog_post_recent_idx'),
+        ),
+    ]
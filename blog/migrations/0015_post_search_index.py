@@ -0,0 +1,33 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_search "
+                              "USING fts5(title, description, content, tokenize='unicode61 remove_diacritics 2')")
+        schema_editor.execute("INSERT INTO blog_post_search (rowid, title, description, content) "
+                              "SELECT post_id, title, description, '' FROM blog_post")
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE INDEX IF NOT EXISTS blog_post_search_idx ON blog_post USING GIN (("
+                              "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                              "setweight(to_tsvector('simple', coalesce(description, '')), 'B')))")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS blog_post_search')
+    elif vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS blog_post_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_timelineentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
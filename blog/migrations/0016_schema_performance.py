@@ -0,0 +1,44 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:08
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('blog', 'Follow')
+    duplicates = Follow.objects.values('follower', 'following') \
+        .annotate(first_id=Min('id'), total=Count('id')) \
+        .filter(total__gt=1)
+    for duplicate in duplicates:
+        Follow.objects.filter(follower=duplicate['follower'], following=duplicate['following']) \
+            .exclude(id=duplicate['first_id']) \
+            .delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_post_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('is_private', False)), fields=['-created_at', '-updated_at', 'post_id'], name='blog_post_public_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['owner', '-created_at', '-updated_at', 'post_id'], name='blog_post_owner_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['collection', '-created_at', '-updated_at', 'post_id'], name='blog_post_coll_recent_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'following'), name='blog_follow_unique_pair'),
+        ),
+    ]
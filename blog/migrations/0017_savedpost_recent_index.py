@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_schema_performance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savedpost',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='blog_savedpost_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_public_post_tags(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('tags', 'Tag')
+    TaggedItem = apps.get_model('tags', 'TaggedItem')
+    content_type = ContentType.objects.filter(app_label='blog', model='post').first()
+    if content_type is None:
+        Tag.objects.update(items_count=0)
+        return
+
+    items = TaggedItem.objects.filter(content_type=content_type,
+                                      object_id__in=Post.objects.filter(is_private=False).values('pk'))
+    Tag.objects.update(items_count=Coalesce(Subquery(items
+                                                     .filter(tag_id=OuterRef('pk'))
+                                                     .order_by()
+                                                     .values('tag_id')
+                                                     .annotate(total=Count('pk'))
+                                                     .values('total')), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0022_timeline_entry_post_index'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0003_tag_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(count_public_post_tags, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from django.db import models
 from .validators import validate_file_size
 from hitcount.models import HitCountMixin, HitCount
 from django.contrib.contenttypes.fields import GenericRelation
+from tags.models import TaggedItem
 import hitcount
 
 class TimeStampedModel(models.Model):
@@ -45,14 +46,31 @@ class Post(TimeStampedModel, HitCountMixin):
     content = RichTextField()
     description = models.TextField()
     thumbnail = models.ImageField(upload_to='blogs/thumbnail', null=True, blank=True)
+    thumbnail_renditions = models.JSONField(default=dict, blank=True, editable=False)
     is_private = models.BooleanField(default=True)
     status = models.SmallIntegerField(choices=POST_STATUS, default=NOT_REQUESTED)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='posts', on_delete=models.CASCADE, null=False, blank=False)
     approved_at = models.DateTimeField(null=True, blank=True)
     likes_count = models.PositiveIntegerField(default=0)
-    hit_count_generic = GenericRelation(HitCount, object_id_field='object_p',
+    views_count = models.PositiveIntegerField(default=0)
+    popularity = models.FloatField(default=0)
+    hit_count_generic = GenericRelation(HitCount, object_id_field='object_pk',
                                         related_query_name='hit_count_generic_relation')
+    tags = GenericRelation(TaggedItem, related_query_name='post')
     collection = models.ForeignKey(Collection, related_name='posts', on_delete=models.PROTECT)
+    # When the related posts were last computed, see related.py.
+    related_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-popularity', '-post_id'], name='blog_post_popularity_idx'),
+            models.Index(fields=['-created_at', '-updated_at', 'post_id'], name='blog_post_recent_idx'),
+            models.Index(fields=['-created_at', '-updated_at', 'post_id'], condition=models.Q(is_private=False),
+                         name='blog_post_public_recent_idx'),
+            models.Index(fields=['owner', '-created_at', '-updated_at', 'post_id'], name='blog_post_owner_recent_idx'),
+            models.Index(fields=['collection', '-created_at', '-updated_at', 'post_id'],
+                         name='blog_post_coll_recent_idx'),
+        ]
 
 
 class SavedPost(models.Model):
@@ -62,9 +80,57 @@ class SavedPost(models.Model):
 
     class Meta:
         unique_together = ('user', 'post') 
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='blog_savedpost_user_recent_idx'),
+        ]
 
 
 class Follow(models.Model):
     follower = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='following', on_delete=models.CASCADE)
     following = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='follower', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'following'], name='blog_follow_unique_pair'),
+        ]
+        indexes = [
+            models.Index(fields=['follower', '-created_at', '-id'], name='blog_follow_follower_idx'),
+            models.Index(fields=['following', '-created_at', '-id'], name='blog_follow_following_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='timeline', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='timeline_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='blog_timeline_user_idx'),
+        ]
+
+
+class SuggestedAuthor(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='suggested_authors', on_delete=models.CASCADE)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='blog_suggestedauthor_user_rank'),
+        ]
+
+
+class RelatedPost(models.Model):
+    post = models.ForeignKey(Post, related_name='related_posts', on_delete=models.CASCADE)
+    related = models.ForeignKey(Post, related_name='+', on_delete=models.CASCADE)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'rank'], name='blog_relatedpost_post_rank'),
+        ]
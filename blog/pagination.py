@@ -1,13 +1,211 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+from operator import attrgetter
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from .models import TimelineEntry
+from .timeline import get_timeline_filter, get_timeline_querysets
 
 
 class PostPagination(PageNumberPagination):
     page_size = 10
-    
 
-class PopularPostPagination(PageNumberPagination):
+
+class FollowListPagination(PageNumberPagination):
+    page_size = 25
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination: every page is fetched with a `WHERE` on the
+    values of the last row seen instead of an `OFFSET`, so deep pages cost
+    the same as the first one and rows inserted meanwhile are not repeated.
+
+    `ordering` must end with a unique field and should be backed by an index.
+    The cursor is opaque to clients and no total count is returned unless
+    `include_count` is set.
+    """
+    page_size = 10
+    ordering = None
+    cursor_query_param = 'cursor'
+    include_count = False
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'keyset_ordering', None) or self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Page over the rows of several querysets sharing the ordering fields
+        (possibly of different models). Each one is read with its own keyset
+        query, bounded to a page, and the rows are merged; rows at the same
+        position are the same item and only the first one is kept.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = list(self.get_ordering(request, querysets[0], view))
+        self.count = sum(queryset.count() for queryset in querysets) if self.include_count else None
+
+        position, reverse = self.decode_cursor(request, querysets[0].model)
+        ordering = [self._flip(field) for field in self.ordering] if reverse else self.ordering
+        results = []
+        for queryset in querysets:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self._seek_filter(ordering, position))
+            results.extend(queryset[:self.page_size + 1])
+        if len(querysets) > 1:
+            results = self._merge(results, ordering)
+
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else True
+        self.has_previous = has_more if reverse else position is not None
+        return results
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.include_count:
+            response['count'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, item, reverse):
+        position = self._position(item, self.ordering)
+        payload = json.dumps({'p': position, 'r': reverse}, default=self._encode_value)
+        cursor = urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            position = payload['p']
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            # Every ordering column is NOT NULL, a null (or a JSON object) can not come from encode_cursor().
+            if not all(isinstance(value, (str, int, float)) for value in position):
+                raise ValueError
+            position = [self._to_python(model, field, value) for field, value in zip(self.ordering, position)]
+            return position, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _seek_filter(self, ordering, position):
+        # (a, b, c) after (x, y, z) == a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z),
+        # plus a leading `a >= x` so the database can range scan the index.
+        seek = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': position[0]}) & seek
+
+    @staticmethod
+    def _position(item, ordering):
+        return [getattr(item, field.lstrip('-')) for field in ordering]
+
+    def _merge(self, rows, ordering):
+        # Stable sorts, last field first, give the multi-column order whatever the directions.
+        for field in reversed(ordering):
+            rows.sort(key=attrgetter(field.lstrip('-')), reverse=field.startswith('-'))
+        seen = set()
+        merged = []
+        for row in rows:
+            position = tuple(self._position(row, ordering))
+            if position not in seen:
+                seen.add(position)
+                merged.append(row)
+        return merged
+
+    @staticmethod
+    def _flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _encode_value(value):
+        # Keep microseconds, DjangoJSONEncoder would truncate them and break ties.
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(f'Can not encode {type(value).__name__} in a cursor')
+
+    @staticmethod
+    def _to_python(model, field, value):
+        try:
+            return model._meta.get_field(field.lstrip('-')).to_python(value)
+        except FieldDoesNotExist:
+            # Annotations (e.g. a search rank) round-trip as plain JSON values.
+            return value
+
+
+class PopularPostPagination(KeysetPagination):
     page_size = 5
+    ordering = ('-popularity', '-post_id')
 
 
-class FollowListPagination(PageNumberPagination):
-    page_size = 25
\ No newline at end of file
+class SavedPostPagination(KeysetPagination):
+    page_size = 20
+    ordering = ('-created_at', '-id')
+
+
+class PostCursorPagination(KeysetPagination):
+    page_size = 10
+    ordering = ('-created_at', '-updated_at', 'post_id')
+    search_ordering = ('-search_rank', 'post_id')
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return self.search_ordering
+        return super().get_ordering(request, queryset, view)
+
+
+
+class TimelinePagination(PostCursorPagination):
+    """
+    Pages /blog/followed/ over the reader's TimelineEntry rows, in the order
+    of blog_timeline_user_idx, merged with one bounded query on the posts of
+    the heavy authors it follows. Searches are ranked, not timeline ordered:
+    they are paged over the posts like the other feeds.
+    """
+    ordering = ('-created_at', '-post_id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if 'search_rank' in queryset.query.annotations:
+            return super().paginate_queryset(queryset.filter(get_timeline_filter(request.user)), request, view)
+
+        rows = self.paginate_querysets(get_timeline_querysets(request.user, queryset), request, view)
+        # Entries carry the post's created_at and id: the cursors are the same for the posts.
+        self.page = [row.post if isinstance(row, TimelineEntry) else row for row in rows]
+        return self.page
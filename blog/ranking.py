@@ -0,0 +1,66 @@
+"""
+Precomputed popularity score backing /blog/popular/.
+
+The score is the likes per view ratio, written by the same ``UPDATE`` that
+moves the counters (see ``get_counter_changes()``). With
+``BLOG_POPULARITY_GRAVITY`` set it is divided by
+``(age_in_hours + 2) ** gravity`` (Hacker News style) so older posts sink;
+the age is not known to the ``UPDATE``, so the score is then refreshed by a
+task and ``manage.py refresh_popularity`` must run periodically.
+"""
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+from .models import Post
+
+
+def get_gravity():
+    return getattr(settings, 'BLOG_POPULARITY_GRAVITY', 0)
+
+
+def compute_popularity(likes_count, views_count, created_at, now=None):
+    ratio = likes_count / views_count if views_count else 0.0
+    gravity = get_gravity()
+    if not gravity or not ratio:
+        return ratio
+
+    now = now or timezone.now()
+    age_in_hours = max((now - created_at).total_seconds() / 3600, 0)
+    return ratio / pow(age_in_hours + 2, gravity)
+
+
+def get_counter_changes(**counters):
+    """
+    `.update()` arguments setting the counters to `counters` (expressions
+    such as ``F('likes_count') + 1``) and, without gravity, the popularity
+    they give, computed in the same statement.
+    """
+    if get_gravity():
+        return counters
+
+    likes_count = counters.get('likes_count', F('likes_count'))
+    views_count = counters.get('views_count', F('views_count'))
+    popularity = Case(When(GreaterThan(views_count, 0),
+                           then=Cast(likes_count, FloatField()) / Cast(views_count, FloatField())),
+                      default=Value(0.0), output_field=FloatField())
+    return {**counters, 'popularity': popularity}
+
+
+def refresh_popularity(post_ids):
+    """
+    Recompute the score of `post_ids` and write back the ones that changed.
+    Returns the number of updated posts.
+    """
+    now = timezone.now()
+    changed = []
+    for post in Post.objects.filter(pk__in=post_ids).only('pk', 'likes_count', 'views_count', 'created_at', 'popularity'):
+        popularity = compute_popularity(post.likes_count, post.views_count, post.created_at, now)
+        if popularity != post.popularity:
+            post.popularity = popularity
+            changed.append(post)
+
+    if changed:
+        Post.objects.bulk_update(changed, ['popularity'])
+    return len(changed)
@@ -0,0 +1,167 @@
+"""
+Precomputed related posts for /blog/detail/<pk>/related/.
+
+Every post is described by three sparse, L2-normalized vectors: its tags,
+the users who liked it and the TF-IDF of its title and description. The
+similarity of two posts is the weighted sum of the cosines of these vectors
+(``TAG_WEIGHT``, ``COLIKE_WEIGHT``, ``TEXT_WEIGHT``) plus ``COLLECTION_WEIGHT``
+when they share a collection. Cosines are accumulated through inverted
+indexes, so only posts sharing something are ever compared; keys shared by
+more than ``BLOG_RELATED_MAX_POSTINGS`` posts are too common to tell posts
+apart and are skipped.
+
+The best ``BLOG_RELATED_POSTS`` public posts are stored per post in
+RelatedPost. ``build_related()`` recomputes the posts changed since their
+last computation (`Post.related_at`) and the neighbours they got, or with
+``full`` every post. Likes do not touch posts, so a post whose likes
+alone changed is only recomputed by a full run: schedule
+``manage.py build_related_posts`` and, now and then, with ``--full``.
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from tags.models import TaggedItem
+from .likes import get_like_model
+from .models import Post, RelatedPost
+
+TAG_WEIGHT = 1.0
+COLIKE_WEIGHT = 1.0
+TEXT_WEIGHT = 1.0
+COLLECTION_WEIGHT = 0.25
+
+TOKEN_RE = re.compile(r'\w{2,}')
+
+
+def get_related_size():
+    return getattr(settings, 'BLOG_RELATED_POSTS', 10)
+
+
+def _normalize(vector):
+    # Zero weights (terms found in every post) are dropped, they can not make posts similar.
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {key: weight / norm for key, weight in vector.items() if weight} if norm else {}
+
+
+def _binary_vectors(pairs):
+    sets = {}
+    for post_id, key in pairs:
+        sets.setdefault(post_id, set()).add(key)
+    return {post_id: _normalize(dict.fromkeys(keys, 1.0)) for post_id, keys in sets.items()}
+
+
+class PostCorpus:
+    """
+    The vectors of every post and, for the public ones, the inverted
+    indexes used to find candidates. Rows are read `chunk_size` at a time.
+    """
+
+    def __init__(self, chunk_size=2000):
+        self.collections = {}
+        self.public = set()
+        term_counts = {}
+        for pk, collection_id, is_private, title, description in Post.objects \
+                .values_list('pk', 'collection_id', 'is_private', 'title', 'description') \
+                .iterator(chunk_size=chunk_size):
+            self.collections[pk] = collection_id
+            if not is_private:
+                self.public.add(pk)
+            term_counts[pk] = Counter(TOKEN_RE.findall(f'{title} {description}'.lower()))
+
+        document_frequency = Counter(term for counts in term_counts.values() for term in counts)
+        total = len(term_counts)
+        text = {pk: _normalize({term: (1 + math.log(count)) * math.log(total / document_frequency[term])
+                                for term, count in counts.items()})
+                for pk, counts in term_counts.items()}
+
+        tags = _binary_vectors(TaggedItem.objects
+                               .filter(content_type=ContentType.objects.get_for_model(Post))
+                               .values_list('object_id', 'tag_id')
+                               .iterator(chunk_size=chunk_size))
+        likers = _binary_vectors(get_like_model().objects
+                                 .values_list('post_id', 'user_id')
+                                 .iterator(chunk_size=chunk_size))
+
+        self.features = [(TAG_WEIGHT, tags, self.build_index(tags)),
+                         (COLIKE_WEIGHT, likers, self.build_index(likers)),
+                         (TEXT_WEIGHT, text, self.build_index(text))]
+
+    def build_index(self, vectors):
+        max_postings = getattr(settings, 'BLOG_RELATED_MAX_POSTINGS', 1000)
+        index = {}
+        for post_id in self.public:
+            for key, weight in vectors.get(post_id, {}).items():
+                index.setdefault(key, []).append((post_id, weight))
+        return {key: postings for key, postings in index.items() if len(postings) <= max_postings}
+
+    def related(self, post_id, size):
+        """
+        Returns the `size` most similar public posts as (post_id, score), best first.
+        """
+        scores = {}
+        for feature_weight, vectors, index in self.features:
+            for key, weight in vectors.get(post_id, {}).items():
+                for other_id, other_weight in index.get(key, ()):
+                    scores[other_id] = scores.get(other_id, 0) + feature_weight * weight * other_weight
+
+        collection_id = self.collections.get(post_id)
+        for other_id in scores:
+            if self.collections[other_id] == collection_id:
+                scores[other_id] += COLLECTION_WEIGHT
+
+        best = heapq.nlargest(size, ((score, -other_id) for other_id, score in scores.items() if other_id != post_id))
+        return [(-negated_id, score) for score, negated_id in best]
+
+
+def get_stale_post_ids():
+    return list(Post.objects
+                .filter(Q(related_at__isnull=True) | Q(updated_at__gt=F('related_at')))
+                .order_by('pk')
+                .values_list('pk', flat=True))
+
+
+def build_related(full=False, batch_size=500, dry_run=False, on_batch=None):
+    """
+    Recompute the related posts of the stale posts and of their new
+    neighbours (or with `full` of every post), `batch_size` posts per
+    transaction. Returns the number of posts and of related rows.
+    """
+    started = timezone.now()
+    stale = [] if full else get_stale_post_ids()
+    corpus = PostCorpus()
+    size = get_related_size()
+    queue = sorted(corpus.collections) if full else stale
+    stale = set(stale)
+    done = set()
+    posts = rows_count = 0
+
+    while queue:
+        batch = [post_id for post_id in dict.fromkeys(queue[:batch_size]) if post_id not in done]
+        queue = queue[batch_size:]
+        if not batch:
+            continue
+        done.update(batch)
+
+        rows = [RelatedPost(post_id=post_id, related_id=related_id, rank=rank, score=score)
+                for post_id in batch
+                for rank, (related_id, score) in enumerate(corpus.related(post_id, size))]
+        if not dry_run:
+            with transaction.atomic():
+                RelatedPost.objects.filter(post_id__in=batch).delete()
+                RelatedPost.objects.bulk_create(rows, batch_size=batch_size)
+                Post.objects.filter(pk__in=batch).update(related_at=started)
+
+        # Similarity is symmetric: the neighbours of a changed post may now rank it too.
+        queue.extend(sorted({row.related_id for row in rows if row.post_id in stale} - done))
+
+        posts += len(batch)
+        rows_count += len(rows)
+        if on_batch is not None:
+            on_batch(posts, rows_count)
+
+    return posts, rows_count
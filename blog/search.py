@@ -0,0 +1,153 @@
+"""
+Full-text search for posts behind the `search` query param.
+
+The backend is picked from the database vendor:
+
+* SQLite uses an FTS5 table (``blog_post_search``) kept in sync from
+  ``Post`` saves and deletes, ranked with bm25.
+* PostgreSQL uses a GIN expression index over a weighted ``tsvector``,
+  ranked with ``ts_rank``; nothing has to be kept in sync.
+* Anything else falls back to ``icontains`` without ranking.
+
+Every term is matched as a prefix and all terms must match. The CKEditor
+``content`` is searched too (with HTML stripped) when
+``BLOG_SEARCH_INCLUDE_CONTENT`` is set; run ``manage.py rebuild_search_index``
+after changing it.
+"""
+import html
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+from django.utils.html import strip_tags
+from .models import Post
+
+
+def include_content():
+    return getattr(settings, 'BLOG_SEARCH_INCLUDE_CONTENT', False)
+
+
+def get_plain_content(post):
+    if not include_content():
+        return ''
+    return html.unescape(strip_tags(post.content or ''))
+
+
+class SimpleSearchBackend:
+    def setup(self):
+        pass
+
+    def teardown(self):
+        pass
+
+    def update(self, posts):
+        pass
+
+    def delete(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, terms):
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class SQLiteSearchBackend(SimpleSearchBackend):
+    table = 'blog_post_search'
+    # bm25 weights of the title, description and content columns.
+    weights = (10.0, 4.0, 1.0)
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} '
+                           f"USING fts5(title, description, content, tokenize='unicode61 remove_diacritics 2')")
+
+    def teardown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def update(self, posts):
+        posts = list(posts)
+        self.delete([post.pk for post in posts])
+        with connection.cursor() as cursor:
+            cursor.executemany(f'INSERT INTO {self.table} (rowid, title, description, content) VALUES (%s, %s, %s, %s)',
+                               [(post.pk, post.title, post.description, get_plain_content(post)) for post in posts])
+
+    def delete(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(post_id,) for post_id in post_ids])
+
+    def rebuild(self, batch_size=500):
+        self.teardown()
+        self.setup()
+        fields = ['pk', 'title', 'description'] + (['content'] if include_content() else [])
+        batch = []
+        for post in Post.objects.only(*fields).iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) >= batch_size:
+                self.update(batch)
+                batch = []
+        self.update(batch)
+
+    def search(self, queryset, terms):
+        match = ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        table = self.table
+        post_id = f'{Post._meta.db_table}.{Post._meta.pk.column}'
+        weights = ', '.join(str(weight) for weight in self.weights)
+
+        return queryset \
+            .filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [match])) \
+            .annotate(search_rank=RawSQL(f'SELECT -bm25({table}, {weights}) FROM {table} '
+                                         f'WHERE {table} MATCH %s AND rowid = {post_id}',
+                                         [match], output_field=FloatField()))
+
+
+class PostgresSearchBackend(SimpleSearchBackend):
+    index = 'blog_post_search_idx'
+
+    def get_document(self, table=None):
+        # The query must repeat the indexed expression for the GIN index to be used.
+        column = (lambda name: f'"{table}"."{name}"') if table else (lambda name: name)
+        document = (f"setweight(to_tsvector('simple', coalesce({column('title')}, '')), 'A') || "
+                    f"setweight(to_tsvector('simple', coalesce({column('description')}, '')), 'B')")
+        if include_content():
+            document += (f" || setweight(to_tsvector('simple', regexp_replace("
+                         f"coalesce({column('content')}, ''), '<[^>]*>', ' ', 'g')), 'C')")
+        return f'({document})'
+
+    def setup(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {self.index} ON {Post._meta.db_table} '
+                           f'USING GIN ({self.get_document()})')
+
+    def teardown(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP INDEX IF EXISTS {self.index}')
+
+    def rebuild(self):
+        self.teardown()
+        self.setup()
+
+    def search(self, queryset, terms):
+        lexemes = [re.sub(r'\W+', '', term) for term in terms]
+        query = ' & '.join(f'{lexeme}:*' for lexeme in lexemes if lexeme)
+        if not query:
+            return super().search(queryset, terms)
+
+        document = self.get_document(Post._meta.db_table)
+        return queryset \
+            .filter(RawSQL(f"{document} @@ to_tsquery('simple', %s)", [query], output_field=BooleanField())) \
+            .annotate(search_rank=RawSQL(f"ts_rank({document}, to_tsquery('simple', %s))",
+                                         [query], output_field=FloatField()))
+
+
+def get_search_backend():
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
@@ -2,7 +2,10 @@ from ckeditor.fields import RichTextField
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from .models import Collection, Post, SavedPost, Follow
+from core.middleware import timer
+from core.serializers import TimedSerializerMixin
+from .images import get_rendition_url
+from .models import Collection, Post, SavedPost, Follow, SuggestedAuthor
 
 User = get_user_model()
 
@@ -34,39 +37,136 @@ class FollowUserSerializer(serializers.Serializer):
             raise serializers.ValidationError(f"Not valid data! Missing value for following or not authenticate.")
 
 class SimpleUserSerializer(serializers.ModelSerializer):
+    profile_picture = serializers.SerializerMethodField()
+
     class Meta:
         model = User
         fields = ['id', 'username', 'profile_picture']
 
+    def get_profile_picture(self, user):
+        return get_rendition_url(user.profile_picture, user.profile_picture_renditions,
+                                 'small', self.context.get('request'))
+
+
+class FollowListUserSerializer(SimpleUserSerializer):
+    """
+    A user of a follow list. `followed_at` is set by the view from the Follow
+    row, the relationship flags come from the `following_ids` / `follower_ids`
+    sets of the context (see follows.get_relationships).
+    """
+    followed_at = serializers.DateTimeField(read_only=True)
+    is_following = serializers.SerializerMethodField()
+    follows_you = serializers.SerializerMethodField()
+
+    class Meta(SimpleUserSerializer.Meta):
+        fields = SimpleUserSerializer.Meta.fields + ['followers_count', 'following_count', 'followed_at',
+                                                     'is_following', 'follows_you']
+
+    def get_is_following(self, user):
+        return user.pk in self.context['following_ids']
+
+    def get_follows_you(self, user):
+        return user.pk in self.context['follower_ids']
+
+
+class SuggestedAuthorSerializer(serializers.ModelSerializer):
+    author = SimpleUserSerializer(read_only=True)
+    followers_count = serializers.IntegerField(source='author.followers_count', read_only=True)
+
+    class Meta:
+        model = SuggestedAuthor
+        fields = ['author', 'followers_count', 'score']
+
 
-class CollectionSerializer(serializers.ModelSerializer):
+class CollectionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Collection
         fields = ['id', 'label']
 
 
-class SimplePostSerializer(serializers.ModelSerializer):
+def get_tag_labels(post):
+    # Feeds load the tags of a whole page (see TaggedItem.objects.load_for), single posts query them.
+    if hasattr(post, 'tagged_items'):
+        return [item.tag.label for item in post.tagged_items]
+    return list(post.tags.order_by('pk').values_list('tag__label', flat=True))
+
+
+class SimplePostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = SimpleUserSerializer(read_only=True)
-    views = serializers.IntegerField(read_only=True)
+    views = serializers.IntegerField(source='views_count', read_only=True)
     collection = CollectionSerializer()
+    thumbnail = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['post_id', 'title', 'description', 'collection', 'views', 'owner']
-
-
-class PostSerializer(serializers.ModelSerializer):
+        fields = ['post_id', 'title', 'description', 'thumbnail', 'collection', 'tags', 'views', 'owner']
+
+    def get_thumbnail(self, post):
+        return get_rendition_url(post.thumbnail, post.thumbnail_renditions, 'small', self.context.get('request'))
+
+    def get_tags(self, post):
+        return get_tag_labels(post)
+
+
+class FastSimplePostSerializer:
+    """
+    Read only stand-in for `SimplePostSerializer(posts, many=True)` on the
+    feeds. It returns the same output but reads attributes directly instead
+    of walking a DRF field tree for every row, which is where most of the
+    time of a page of posts goes. Keep it in sync with SimplePostSerializer.
+    """
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+
+    @property
+    def data(self):
+        request = self.context.get('request')
+        with timer('serializer'):
+            return [self.to_representation(post, request) for post in self.instance]
+
+    @staticmethod
+    def to_representation(post, request=None):
+        owner = post.owner
+        collection = post.collection
+        return {
+            'post_id': post.post_id,
+            'title': post.title,
+            'description': post.description,
+            'thumbnail': get_rendition_url(post.thumbnail, post.thumbnail_renditions, 'small', request),
+            'collection': {
+                'id': collection.id,
+                'label': collection.label,
+            },
+            'tags': get_tag_labels(post),
+            'views': post.views_count,
+            'owner': {
+                'id': owner.id,
+                'username': owner.username,
+                'profile_picture': get_rendition_url(owner.profile_picture, owner.profile_picture_renditions,
+                                                     'small', request),
+            },
+        }
+
+
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Post
-        fields = ['post_id', 'title', 'description', 'content', 'thumbnail', 'is_private', 'collection', 'collection_name', 'views', 'likes_count', 'liked_status', 'created_at', 'owner']
+        fields = ['post_id', 'title', 'description', 'content', 'thumbnail', 'is_private', 'collection', 'collection_name', 'tags', 'views', 'likes_count', 'liked_status', 'created_at', 'owner']
 
     content = RichTextField()
     collection_name = serializers.StringRelatedField(source='collection', read_only=True)
-    views = serializers.IntegerField(read_only=True)
+    views = serializers.IntegerField(source='views_count', read_only=True)
     liked_status = serializers.SerializerMethodField(read_only=True, method_name='get_liked_status')
     likes_count = serializers.IntegerField(read_only=True)
     owner = SimpleUserSerializer(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
+    tags = serializers.SerializerMethodField()
+
+    def get_tags(self, post: Post) -> list:
+        return get_tag_labels(post)
 
     def get_liked_status(self, post: Post) -> bool:
         if hasattr(post, 'liked') and post.liked is True:
@@ -100,7 +200,16 @@ class PostSerializer(serializers.ModelSerializer):
         return super().update(instance, validated_data)
     
 
-class SavedPostSerializer(serializers.ModelSerializer):
+class SavedPostListSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    post = SimplePostSerializer(read_only=True)
+    saved_at = serializers.DateTimeField(source='created_at', read_only=True)
+
+    class Meta:
+        model = SavedPost
+        fields = ('id', 'saved_at', 'post')
+
+
+class SavedPostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     post = PostSerializer()  
 
     class Meta:
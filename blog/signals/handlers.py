@@ -1,11 +1,132 @@
 import datetime
 from django.dispatch import receiver
-from django.db.models.signals import post_save, pre_save
-from blog.models import Post
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F
+from django.utils import timezone
+from blog import cache, images, tagging, tasks, timeline
+from blog.models import Collection, Follow, Post
+from tags.models import TaggedItem
 
 @receiver(pre_save, sender=Post)
 def create_timestamp_at_approved(sender, **kwargs):
     instance = kwargs['instance']
     if instance.status == Post.APPROVED:
         instance.approved_at = datetime.datetime.now()
-        instance.is_private = 0
\ No newline at end of file
+        instance.is_private = 0
+
+
+@receiver(post_save, sender=Post)
+def update_timelines(sender, **kwargs):
+    tasks.sync_post_timeline.delay(post_id=kwargs['instance'].pk)
+
+
+@receiver(post_save, sender=Follow)
+def increment_follow_counts(sender, **kwargs):
+    if kwargs['created']:
+        instance = kwargs['instance']
+        User = get_user_model()
+        User.objects.filter(pk=instance.follower_id).update(following_count=F('following_count') + 1)
+        User.objects.filter(pk=instance.following_id).update(followers_count=F('followers_count') + 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_follow_counts(sender, **kwargs):
+    instance = kwargs['instance']
+    User = get_user_model()
+    User.objects.filter(pk=instance.follower_id, following_count__gt=0).update(following_count=F('following_count') - 1)
+    User.objects.filter(pk=instance.following_id, followers_count__gt=0).update(followers_count=F('followers_count') - 1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, **kwargs):
+    if kwargs['created']:
+        instance = kwargs['instance']
+        tasks.sync_following.delay(follower_id=instance.follower_id, following_id=instance.following_id)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_timeline(sender, **kwargs):
+    instance = kwargs['instance']
+    tasks.sync_following.delay(follower_id=instance.follower_id, following_id=instance.following_id)
+    # Back under the fan-out limit: its posts are no longer read at request time.
+    if get_user_model().objects.filter(pk=instance.following_id, followers_count=timeline.get_fanout_limit()).exists():
+        tasks.backfill_author_timelines.delay(author_id=instance.following_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def update_search_index(sender, **kwargs):
+    tasks.index_posts.delay(post_ids=[kwargs['instance'].pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Collection)
+@receiver(post_delete, sender=Collection)
+def invalidate_cached_lists(sender, **kwargs):
+    cache.invalidate_for(sender._meta.model_name)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_owner_lists(sender, **kwargs):
+    # Usernames and pictures are rendered in the lists; logins only touch last_login.
+    if kwargs['update_fields'] != frozenset(['last_login']):
+        cache.invalidate_for('user')
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def touch_tagged_post(sender, **kwargs):
+    # Tags are part of the post payloads: move updated_at (ETags, cached detail) and drop the cached lists.
+    instance = kwargs['instance']
+    if instance.content_type_id == ContentType.objects.get_for_model(Post).pk:
+        Post.objects.filter(pk=instance.object_id).update(updated_at=timezone.now())
+        cache.invalidate_for('taggeditem')
+
+
+@receiver(post_save, sender=TaggedItem)
+def increment_tag_count(sender, **kwargs):
+    if kwargs['created']:
+        tagging.count_item(kwargs['instance'], 1)
+
+
+@receiver(post_delete, sender=TaggedItem)
+def decrement_tag_count(sender, **kwargs):
+    tagging.count_item(kwargs['instance'], -1)
+
+
+@receiver(pre_save, sender=Post)
+def remember_visibility(sender, **kwargs):
+    instance = kwargs['instance']
+    instance._was_public = instance.pk is not None \
+        and Post.objects.filter(pk=instance.pk, is_private=False).exists()
+
+
+@receiver(post_save, sender=Post)
+def count_tags_on_visibility_change(sender, **kwargs):
+    instance = kwargs['instance']
+    if instance._was_public != (not instance.is_private):
+        tagging.count_post_tags(instance.pk, -1 if instance._was_public else 1)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_deleted_post_tags(sender, **kwargs):
+    if not kwargs['instance'].is_private:
+        tagging.count_post_tags(kwargs['instance'].pk, -1)
+
+
+@receiver(post_save, sender=Post)
+def render_thumbnail(sender, **kwargs):
+    if images.needs_renditions(kwargs['instance'], 'thumbnail', 'thumbnail_renditions'):
+        tasks.render_renditions.delay(model='blog.Post', pk=kwargs['instance'].pk,
+                                      field_name='thumbnail', renditions_field='thumbnail_renditions')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def render_profile_picture(sender, **kwargs):
+    if images.needs_renditions(kwargs['instance'], 'profile_picture', 'profile_picture_renditions'):
+        tasks.render_renditions.delay(model=settings.AUTH_USER_MODEL, pk=kwargs['instance'].pk,
+                                      field_name='profile_picture', renditions_field='profile_picture_renditions')
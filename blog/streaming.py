@@ -0,0 +1,38 @@
+"""
+NDJSON streaming for the `/blog/export/` endpoint.
+
+Rows are read with ``.iterator(chunk_size=...)`` and written one chunk at a
+time through a ``StreamingHttpResponse``, so memory use does not depend on
+how many posts are exported.
+"""
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def get_chunk_size():
+    return getattr(settings, 'BLOG_EXPORT_CHUNK_SIZE', 500)
+
+
+def iter_ndjson(rows, to_representation, chunk_size, load_chunk=None):
+    """
+    Yields the NDJSON of `rows`, one string per `chunk_size` rows.
+    `load_chunk`, if given, is called with every chunk before it is
+    serialized, e.g. to attach related rows in one query per chunk.
+    """
+    encoder = JSONEncoder()
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        if load_chunk is not None:
+            load_chunk(chunk)
+        yield '\n'.join(encoder.encode(to_representation(row)) for row in chunk) + '\n'
+
+
+def ndjson_response(queryset, to_representation, filename, load_chunk=None):
+    chunk_size = get_chunk_size()
+    rows = queryset.iterator(chunk_size=chunk_size)
+    response = StreamingHttpResponse(iter_ndjson(rows, to_representation, chunk_size, load_chunk),
+                                     content_type='application/x-ndjson')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
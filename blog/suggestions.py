@@ -0,0 +1,110 @@
+"""
+Offline "who to follow" suggestions for /users/suggested/.
+
+`build_suggestions()` loads the follows and the likes on public posts once,
+as adjacency sets, and scores for every user the authors they do not follow:
+
+* friends of friends: ``FOLLOW_WEIGHT`` per followed user following the author,
+* liked authors: ``LIKE_WEIGHT`` per post of the author the user liked,
+* co-likes: ``COLIKE_WEIGHT / likers`` per post both liked. Posts with more
+  than ``BLOG_SUGGESTIONS_MAX_LIKERS`` likers say little and are skipped.
+
+The best ``BLOG_SUGGESTED_AUTHORS`` are stored per user in SuggestedAuthor
+so the endpoint is one indexed read. Schedule
+``manage.py build_suggested_authors``.
+"""
+import heapq
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from .likes import get_like_model
+from .models import Follow, Post, SuggestedAuthor
+
+FOLLOW_WEIGHT = 1.0
+LIKE_WEIGHT = 0.5
+COLIKE_WEIGHT = 2.0
+
+
+def get_suggestions_size():
+    return getattr(settings, 'BLOG_SUGGESTED_AUTHORS', 20)
+
+
+class FollowGraph:
+    """
+    Follow and like edges held in memory, read `chunk_size` rows at a time.
+    """
+
+    def __init__(self, chunk_size=10000):
+        self.following = {}
+        for follower_id, following_id in Follow.objects.values_list('follower_id', 'following_id') \
+                .iterator(chunk_size=chunk_size):
+            self.following.setdefault(follower_id, set()).add(following_id)
+
+        self.post_authors = dict(Post.objects.filter(is_private=False).values_list('pk', 'owner_id')
+                                 .iterator(chunk_size=chunk_size))
+        self.author_ids = set(self.post_authors.values())
+
+        self.liked = {}
+        self.likers = {}
+        for user_id, post_id in get_like_model().objects.filter(post__is_private=False) \
+                .values_list('user_id', 'post_id').iterator(chunk_size=chunk_size):
+            self.liked.setdefault(user_id, set()).add(post_id)
+            self.likers.setdefault(post_id, set()).add(user_id)
+
+    def suggest(self, user_id, size, max_likers):
+        """
+        Returns the `size` best (author_id, score) for `user_id`, best first.
+        """
+        scores = {}
+        followed = self.following.get(user_id, set())
+        for followed_id in followed:
+            for author_id in self.following.get(followed_id, ()):
+                scores[author_id] = scores.get(author_id, 0) + FOLLOW_WEIGHT
+
+        for post_id in self.liked.get(user_id, ()):
+            author_id = self.post_authors[post_id]
+            scores[author_id] = scores.get(author_id, 0) + LIKE_WEIGHT
+            likers = self.likers[post_id]
+            if len(likers) <= max_likers:
+                weight = COLIKE_WEIGHT / len(likers)
+                for liker_id in likers:
+                    scores[liker_id] = scores.get(liker_id, 0) + weight
+
+        best = heapq.nlargest(size, ((score, -author_id) for author_id, score in scores.items()
+                                     if author_id in self.author_ids and author_id != user_id
+                                     and author_id not in followed))
+        return [(-negated_id, score) for score, negated_id in best]
+
+
+def build_suggestions(batch_size=1000, dry_run=False, on_batch=None):
+    """
+    Recompute the suggestions of every user, `batch_size` users per
+    transaction. Returns the number of users and of suggestions.
+    """
+    graph = FollowGraph()
+    size = get_suggestions_size()
+    max_likers = getattr(settings, 'BLOG_SUGGESTIONS_MAX_LIKERS', 1000)
+    users = suggestions = 0
+    last_pk = 0
+
+    while True:
+        user_ids = list(get_user_model().objects.filter(pk__gt=last_pk).order_by('pk')
+                        .values_list('pk', flat=True)[:batch_size])
+        if not user_ids:
+            break
+        last_pk = user_ids[-1]
+
+        rows = [SuggestedAuthor(user_id=user_id, author_id=author_id, rank=rank, score=score)
+                for user_id in user_ids
+                for rank, (author_id, score) in enumerate(graph.suggest(user_id, size, max_likers))]
+        if not dry_run:
+            with transaction.atomic():
+                SuggestedAuthor.objects.filter(user_id__in=user_ids).delete()
+                SuggestedAuthor.objects.bulk_create(rows, batch_size=batch_size)
+
+        users += len(user_ids)
+        suggestions += len(rows)
+        if on_batch is not None:
+            on_batch(users, suggestions)
+
+    return users, suggestions
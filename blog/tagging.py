@@ -0,0 +1,53 @@
+"""
+``Tag.items_count`` for the tag cloud: the number of public posts carrying
+the tag, so tags on private posts (or on other content types) are not
+advertised.
+
+The signal handlers keep it up to date through ``F()`` updates when a post
+is tagged or untagged, goes public or private, or is deleted. Bulk writes
+and ``.update()`` calls skip the signals, call ``refresh_tag_counts()``
+after them.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Exists, F
+from tags.models import Tag, TaggedItem
+from .models import Post
+
+
+def get_post_items():
+    return TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Post))
+
+
+def get_counted_items():
+    """
+    The TaggedItem rows counted in `items_count`.
+    """
+    return get_post_items().filter(object_id__in=Post.objects.filter(is_private=False).values('pk'))
+
+
+def refresh_tag_counts(tag_ids=None):
+    return Tag.objects.refresh_counts(tag_ids, items=get_counted_items())
+
+
+def count_item(item, delta):
+    """
+    Add `delta` to the count of the tag of `item` if it tags a public post.
+    """
+    if item.content_type_id != ContentType.objects.get_for_model(Post).pk:
+        return
+    public = Exists(Post.objects.filter(pk=item.object_id, is_private=False))
+    tags = Tag.objects.filter(public, pk=item.tag_id)
+    if delta < 0:
+        tags = tags.filter(items_count__gt=0)
+    tags.update(items_count=F('items_count') + delta)
+
+
+def count_post_tags(post_id, delta):
+    """
+    Add `delta` to the counts of every tag of `post_id`, which went public
+    (1) or stopped being public (-1).
+    """
+    tags = Tag.objects.filter(pk__in=get_post_items().filter(object_id=post_id).values('tag_id'))
+    if delta < 0:
+        tags = tags.filter(items_count__gt=0)
+    tags.update(items_count=F('items_count') + delta)
@@ -0,0 +1,53 @@
+"""
+Post side effects run by the task queue (see tasks/queue.py).
+
+Every task reads the current state of the rows it gets ids for, so running
+one late, twice or out of order leaves the same result.
+"""
+from django.apps import apps
+from tasks.queue import task
+from . import images, timeline
+from .models import Follow, Post
+from .ranking import refresh_popularity
+from .search import get_search_backend
+
+
+@task
+def render_renditions(model, pk, field_name, renditions_field):
+    images.process(apps.get_model(model), pk, field_name, renditions_field)
+
+
+@task
+def index_posts(post_ids):
+    backend = get_search_backend()
+    posts = list(Post.objects.filter(pk__in=post_ids))
+    backend.update(posts)
+    backend.delete(set(post_ids) - {post.pk for post in posts})
+
+
+@task
+def sync_post_timeline(post_id):
+    post = Post.objects.filter(pk=post_id).only('pk', 'owner_id', 'is_private', 'created_at').first()
+    if post is None or post.is_private:
+        timeline.retract_post(Post(pk=post_id))
+    else:
+        # Entries written meanwhile (e.g. a follow backfill) are skipped by ignore_conflicts.
+        timeline.fan_out_post(post)
+
+
+@task
+def sync_following(follower_id, following_id):
+    if Follow.objects.filter(follower_id=follower_id, following_id=following_id).exists():
+        timeline.add_following(follower_id, following_id)
+    else:
+        timeline.remove_following(follower_id, following_id)
+
+
+@task
+def backfill_author_timelines(author_id):
+    timeline.backfill_followers(author_id)
+
+
+@task
+def refresh_post_popularity(post_ids):
+    refresh_popularity(post_ids)
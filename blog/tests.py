@@ -1,3 +1,1055 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from base64 import urlsafe_b64encode
+from unittest import skipUnless
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIRequestFactory, APITestCase
+from hitcount.models import BlacklistIP, Hit, HitCount
+from PIL import Image
+from core.models import User
+from tags.models import Tag, TaggedItem
+from tasks.models import Task
+from . import images, tasks, timeline
+from .cache import get_cache
+from .hits import PendingHit, apply_hits, hit_buffer
+from .likes import like_post, unlike_post
+from .models import Collection, Follow, Post, SavedPost, TimelineEntry
+from .search import SQLiteSearchBackend, get_search_backend
+from .serializers import FastSimplePostSerializer, SimplePostSerializer
+from .tagging import refresh_tag_counts
 
-# Create your tests here.
+
+class PostDetailQueryCountTests(APITestCase):
+    # Detail query, hitcount bookkeeping (get_or_create, blacklists, active hits,
+    # counters), popularity refresh and the content of an uncached payload.
+    MAX_QUERIES = 14
+
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.viewer = User.objects.create_user(email='viewer@example.com', username='viewer', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+
+    def create_post(self, likes):
+        post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                   owner=self.owner, collection=self.collection, is_private=False)
+        users = User.objects.bulk_create([User(email=f'liker{post.pk}-{i}@example.com', username=f'liker{i}')
+                                          for i in range(likes)])
+        for user in users:
+            like_post(user, post.pk)
+        return post
+
+    def count_detail_queries(self, post):
+        # Warm up per-process caches (content types, cache versions) first.
+        self.client.get(f'/blog/detail/{self.create_post(likes=0).pk}/')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/blog/detail/{post.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_detail_queries_do_not_grow_with_likes(self):
+        self.client.force_authenticate(self.viewer)
+        few_likes = self.create_post(likes=1)
+        many_likes = self.create_post(likes=50)
+        like_post(self.viewer, many_likes.pk)
+
+        few_queries, _ = self.count_detail_queries(few_likes)
+        many_queries, response = self.count_detail_queries(many_likes)
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(many_queries, self.MAX_QUERIES)
+        self.assertTrue(response.data['liked_status'])
+        self.assertEqual(response.data['likes_count'], 51)
+
+    def test_anonymous_detail_queries_do_not_grow_with_likes(self):
+        few_queries, _ = self.count_detail_queries(self.create_post(likes=1))
+        many_queries, response = self.count_detail_queries(self.create_post(likes=50))
+
+        self.assertEqual(few_queries, many_queries)
+        self.assertLessEqual(many_queries, self.MAX_QUERIES)
+        self.assertFalse(response.data['liked_status'])
+
+
+@override_settings(BLOG_HITS_BUFFERED=True, HITCOUNT_HITS_PER_IP_LIMIT=0)
+class HitBufferTests(APITestCase):
+    def setUp(self):
+        hit_buffer.flush()
+        self.addCleanup(hit_buffer.flush)
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.post = self.create_post()
+
+    def create_post(self):
+        return Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                   owner=self.owner, collection=self.collection, is_private=False)
+
+    def visit(self, post=None, session='session', ip='10.0.0.1', user=None):
+        return PendingHit(post_id=(post or self.post).pk, session=session, ip=ip, user_agent='agent',
+                          user_id=user and user.pk)
+
+    def test_flush_counts_buffered_views(self):
+        for client in (self.client, self.client_class(), self.client_class()):
+            client.get(f'/blog/detail/{self.post.pk}/')
+        self.client.get(f'/blog/detail/{self.post.pk}/')
+        self.assertEqual(len(hit_buffer), 3)
+
+        self.assertEqual(hit_buffer.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+        self.assertEqual(HitCount.objects.get_for_object(self.post).hits, 3)
+        self.assertEqual(len(hit_buffer), 0)
+
+    def test_session_and_user_dedup(self):
+        self.assertEqual(apply_hits([self.visit(session='a'), self.visit(session='a'), self.visit(session='b'),
+                                     self.visit(session='c', user=self.owner),
+                                     self.visit(session='d', user=self.owner)]), 3)
+        # Still active: neither the session nor the user count again.
+        self.assertEqual(apply_hits([self.visit(session='a'), self.visit(session='e', user=self.owner)]), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views_count, 3)
+
+    def test_blacklisted_ip(self):
+        BlacklistIP.objects.create(ip='10.0.0.9')
+        self.assertEqual(apply_hits([self.visit(session='a', ip='10.0.0.9'), self.visit(session='b')]), 1)
+
+    @override_settings(HITCOUNT_HITS_PER_IP_LIMIT=2)
+    def test_hits_per_ip_limit_counts_every_post(self):
+        self.assertEqual(apply_hits([self.visit(post=self.create_post(), session='a')]), 1)
+        self.assertEqual(apply_hits([self.visit(session='b'), self.visit(session='c'),
+                                     self.visit(session='d', ip='10.0.0.2')]), 2)
+        self.assertEqual(Hit.objects.filter(ip='10.0.0.1').count(), 2)
+
+
+class LikeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='secret')
+        self.post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                        owner=self.user, collection=Collection.objects.create(label='Tech'),
+                                        is_private=False)
+        self.url = f'/blog/detail/{self.post.pk}/like/'
+        self.client.force_authenticate(self.user)
+
+    def assertLikes(self, count):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, count)
+        self.assertEqual(self.post.liked_by.count(), count)
+
+    def test_put_and_delete_are_idempotent(self):
+        for _ in range(2):
+            self.assertEqual(self.client.put(self.url).data, {'liked': True})
+        self.assertLikes(1)
+
+        for _ in range(2):
+            self.assertEqual(self.client.delete(self.url).data, {'liked': False})
+        self.assertLikes(0)
+
+    def test_post_toggles(self):
+        self.assertEqual(self.client.post(self.url).data, {'liked': True})
+        self.assertLikes(1)
+        self.assertEqual(self.client.post(self.url).data, {'liked': False})
+        self.assertLikes(0)
+
+    def test_anonymous_can_not_like(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.put(self.url).status_code, 401)
+        self.assertLikes(0)
+
+    def test_reconcile_likes_repairs_drift(self):
+        like_post(self.user, self.post.pk)
+        Post.objects.filter(pk=self.post.pk).update(likes_count=5, views_count=4, popularity=0.0)
+
+        output = io.StringIO()
+        call_command('reconcile_likes', stdout=output)
+        self.assertIn('1 updated', output.getvalue())
+        self.assertLikes(1)
+        self.assertEqual(self.post.popularity, 0.25)
+
+    def test_sync_post_views_repairs_drift(self):
+        like_post(self.user, self.post.pk)
+        HitCount.objects.create(content_object=self.post, hits=4)
+        Post.objects.filter(pk=self.post.pk).update(views_count=1, popularity=1.0)
+
+        output = io.StringIO()
+        call_command('sync_post_views', stdout=output)
+        self.assertIn('1 updated', output.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views_count, self.post.popularity), (4, 0.25))
+
+    def test_popular_pages_are_keyset_paginated(self):
+        posts = [self.post] + [Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                                   owner=self.user, collection=self.post.collection, is_private=False)
+                               for _ in range(6)]
+        for i, post in enumerate(posts):
+            Post.objects.filter(pk=post.pk).update(popularity=0.5 if i % 2 else 0.25)
+        expected = sorted(posts, key=lambda post: (0.5 if posts.index(post) % 2 else 0.25, post.pk), reverse=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/blog/popular/').data
+        self.assertFalse([query for query in queries.captured_queries if 'COUNT(' in query['sql']])
+        self.assertNotIn('count', first)
+        second = self.client.get(first['next']).data
+        self.assertEqual([post['post_id'] for post in first['results'] + second['results']],
+                         [post.pk for post in expected])
+        self.assertIsNone(second['next'])
+
+    def test_popularity_is_written_with_the_counters(self):
+        Post.objects.filter(pk=self.post.pk).update(views_count=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(self.url)
+            self.client.get(f'/blog/detail/{self.post.pk}/')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.views_count, self.post.popularity), (4, 0.25))
+        self.assertFalse(Task.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.popularity, 0.0)
+
+    @override_settings(BLOG_POPULARITY_GRAVITY=1.8)
+    def test_decayed_popularity_refreshes_are_coalesced(self):
+        other = User.objects.create_user(email='other@example.com', username='other', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            like_post(self.user, self.post.pk)
+            like_post(other, self.post.pk)
+            unlike_post(other, self.post.pk)
+        self.assertEqual(list(Task.objects.values_list('name', 'kwargs')),
+                         [('blog.tasks.refresh_post_popularity', {'post_ids': [self.post.pk]})])
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.posts = [self.create_post(i) for i in range(25)]
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, i):
+        return Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                   owner=self.user, collection=self.collection, is_private=False)
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['post_id'] for row in response.data['results']], response.data['next'], response.data['previous']
+
+    def test_next_and_previous_pages(self):
+        newest_first = [post.pk for post in reversed(self.posts)]
+
+        first, next_url, previous_url = self.get_page('/blog/')
+        self.assertEqual(first, newest_first[:10])
+        self.assertIsNone(previous_url)
+
+        second, next_url, previous_url = self.get_page(next_url)
+        self.assertEqual(second, newest_first[10:20])
+
+        last, last_next_url, last_previous_url = self.get_page(next_url)
+        self.assertEqual(last, newest_first[20:])
+        self.assertIsNone(last_next_url)
+
+        self.assertEqual(self.get_page(last_previous_url)[0], second)
+        self.assertEqual(self.get_page(previous_url)[0], first)
+
+    def test_pages_are_stable_under_inserts(self):
+        first, next_url, _ = self.get_page('/blog/')
+        self.create_post('new')
+        second, _, _ = self.get_page(next_url)
+
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(second, [post.pk for post in reversed(self.posts)][10:20])
+
+    def test_invalid_cursors(self):
+        def encode(payload):
+            return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in ('garbage', encode({'p': [None, None, None], 'r': False}), encode({'p': [1], 'r': False}),
+                       encode({'p': {'a': 1}, 'r': False}), encode([1, 2, 3]), encode({'p': [{}, [], 1], 'r': False})):
+            self.assertEqual(self.client.get('/blog/', {'cursor': cursor}).status_code, 404, cursor)
+
+
+@override_settings(BLOG_TIMELINE_FANOUT_LIMIT=1)
+class TimelineFeedTests(APITestCase):
+    def setUp(self):
+        cache.delete(timeline.HEAVY_AUTHORS_CACHE_KEY)
+        self.reader, self.light, self.heavy, self.other = [
+            User.objects.create_user(email=f'{name}@example.com', username=name, password='secret')
+            for name in ('reader', 'light', 'heavy', 'other')]
+        Follow.objects.create(follower=self.reader, following=self.light)
+        Follow.objects.create(follower=self.reader, following=self.heavy)
+        Follow.objects.create(follower=self.other, following=self.heavy)
+        self.tech = Collection.objects.create(label='Tech')
+        self.art = Collection.objects.create(label='Art')
+
+        self.posts = []
+        for i in range(8):
+            for owner in (self.light, self.heavy, self.other):
+                post = Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                           owner=owner, collection=self.tech if i % 2 else self.art,
+                                           is_private=i == 5)
+                timeline.fan_out_post(post)
+                if owner != self.other and not post.is_private:
+                    self.posts.append(post)
+        # Fanned out before its author got heavy: read through both sources, listed once.
+        self.refanned = self.posts[1]
+        TimelineEntry.objects.create(user=self.reader, post=self.refanned, created_at=self.refanned.created_at)
+        self.posts.sort(key=lambda post: (post.created_at, post.pk), reverse=True)
+        self.client.force_authenticate(self.reader)
+
+    def get_pages(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([post['post_id'] for post in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_entries_and_heavy_authors_are_merged(self):
+        self.assertFalse(TimelineEntry.objects.filter(post__owner=self.heavy).exclude(post=self.refanned).exists())
+        pages = self.get_pages('/blog/followed/')
+        self.assertEqual([len(page) for page in pages], [10, 4])
+        self.assertEqual(sum(pages, []), [post.pk for post in self.posts])
+
+        second = self.client.get('/blog/followed/').data['next']
+        previous = self.client.get(second).data['previous']
+        self.assertEqual([post['post_id'] for post in self.client.get(previous).data['results']], pages[0])
+
+    def test_posts_made_private_leave_the_feed_before_the_sync(self):
+        get_search_backend().update(Post.objects.all())
+        post = next(post for post in self.posts if post.owner == self.light)
+        post.is_private = True
+        post.save()
+
+        self.assertTrue(TimelineEntry.objects.filter(post=post).exists())
+        self.assertNotIn(post.pk, sum(self.get_pages('/blog/followed/'), []))
+        self.assertNotIn(post.pk, sum(self.get_pages('/blog/followed/?search=post'), []))
+        self.assertIn(self.posts[0].pk, sum(self.get_pages('/blog/followed/?search=post'), []))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_author_back_under_the_limit_is_backfilled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(follower=self.other, following=self.heavy).delete()
+        self.assertEqual(set(TimelineEntry.objects.filter(user=self.reader, post__owner=self.heavy)
+                             .values_list('post_id', flat=True)),
+                         {post.pk for post in self.posts if post.owner == self.heavy})
+        self.assertEqual(sum(self.get_pages('/blog/followed/'), []), [post.pk for post in self.posts])
+
+    @override_settings(BLOG_TIMELINE_FANOUT_LIMIT=5000)
+    def test_sync_fans_out_to_followers_without_entries(self):
+        cache.delete(timeline.HEAVY_AUTHORS_CACHE_KEY)
+        # Followed after the post was fanned out, the follow backfill has not run yet.
+        Follow.objects.create(follower=self.other, following=self.light)
+        post = Post.objects.filter(owner=self.light, is_private=False).first()
+        tasks.sync_post_timeline(post_id=post.pk)
+        self.assertEqual(set(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True)),
+                         {self.reader.pk, self.other.pk})
+
+    def test_filters_apply_to_both_sources(self):
+        pages = self.get_pages(f'/blog/followed/?collection={self.tech.pk}')
+        self.assertEqual(sum(pages, []), [post.pk for post in self.posts if post.collection_id == self.tech.pk])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'The FTS5 backend only runs on SQLite.')
+@override_settings(TASKS_EAGER=True)
+class SearchBackendTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title = self.create_post('Django performance', 'Query tuning')
+            self.in_description = self.create_post('Notes', 'Django performance checklist')
+            self.other = self.create_post('Gardening', 'Spring bulbs')
+
+    def create_post(self, title, description):
+        return Post.objects.create(title=title, description=description, content='<p>Content</p>',
+                                   owner=self.owner, collection=self.collection, is_private=False)
+
+    def search(self, terms):
+        response = self.client.get('/blog/', {'search': terms})
+        self.assertEqual(response.status_code, 200)
+        return [post['post_id'] for post in response.data['results']]
+
+    def get_indexed_ids(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {SQLiteSearchBackend.table} ORDER BY rowid')
+            return [row[0] for row in cursor.fetchall()]
+
+    def test_saved_posts_are_indexed(self):
+        self.assertEqual(self.get_indexed_ids(), sorted([self.in_title.pk, self.in_description.pk, self.other.pk]))
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search('django'), [self.in_title.pk, self.in_description.pk])
+        ranks = SQLiteSearchBackend().search(Post.objects.all(), ['django']).values_list('search_rank', flat=True)
+        self.assertTrue(all(rank > 0 for rank in ranks))
+
+    def test_terms_are_prefixes_and_all_must_match(self):
+        self.assertEqual(self.search('perf'), [self.in_title.pk, self.in_description.pk])
+        self.assertEqual(self.search('djan check'), [self.in_description.pk])
+        self.assertEqual(self.search('django garden'), [])
+
+    def test_edited_post_is_reindexed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_description.description = 'Spring checklist'
+            self.in_description.save()
+        self.assertEqual(self.search('django'), [self.in_title.pk])
+        self.assertEqual(self.search('spring'), [self.in_description.pk, self.other.pk])
+
+    def test_deleted_post_is_removed(self):
+        pk = self.in_title.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.in_title.delete()
+        self.assertNotIn(pk, self.get_indexed_ids())
+        self.assertEqual(self.search('django'), [self.in_description.pk])
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.reader = User.objects.create_user(email='reader@example.com', username='reader', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                        owner=self.owner, collection=self.collection, is_private=False)
+
+    def get_list(self):
+        response = self.client.get('/blog/')
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assertCached(self, hit):
+        self.assertEqual(self.get_list()['X-Cache'], 'HIT' if hit else 'MISS')
+
+    def test_anonymous_lists_are_cached(self):
+        self.assertCached(False)
+        self.assertCached(True)
+        self.assertEqual(self.client.get('/blog/', {'collection': self.collection.pk})['X-Cache'], 'MISS')
+
+        self.client.force_authenticate(self.reader)
+        self.assertNotIn('X-Cache', self.get_list())
+
+    def test_writes_invalidate_lists(self):
+        self.assertCached(False)
+        self.post.title = 'Edited'
+        self.post.save()
+        response = self.get_list()
+        self.assertEqual((response['X-Cache'], response.data['results'][0]['title']), ('MISS', 'Edited'))
+
+        like_post(self.reader, self.post.pk)
+        self.assertCached(False)
+        self.assertCached(True)
+        self.assertEqual(self.client.get('/blog/popular/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/blog/popular/')['X-Cache'], 'HIT')
+        like_post(self.owner, self.post.pk)
+        self.assertEqual(self.client.get('/blog/popular/')['X-Cache'], 'MISS')
+
+        self.collection.label = 'Science'
+        self.collection.save()
+        self.assertCached(False)
+
+    def test_detail_payload_merges_live_counters(self):
+        url = f'/blog/detail/{self.post.pk}/'
+        self.assertEqual(self.client.get(url).data['title'], 'Title')
+
+        # Changes that do not move updated_at: the counters are live, the rest comes from the cache.
+        Post.objects.filter(pk=self.post.pk).update(title='Stale', likes_count=5)
+        like_post(self.reader, self.post.pk)
+        data = self.client.get(url).data
+        self.assertEqual((data['title'], data['likes_count'], data['liked_status']), ('Title', 6, False))
+        self.assertEqual(data['views'], Post.objects.get(pk=self.post.pk).views_count)
+
+        self.client.force_authenticate(self.reader)
+        self.assertIs(self.client.get(url).data['liked_status'], True)
+
+        self.post.refresh_from_db()
+        self.post.title = 'Edited'
+        self.post.save()
+        self.assertEqual(self.client.get(url).data['title'], 'Edited')
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                        owner=self.owner, collection=self.collection, is_private=False)
+        self.urls = ['/blog/', f'/blog/detail/{self.post.pk}/']
+
+    def get_etags(self):
+        etags = []
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            etags.append(response['ETag'])
+        return etags
+
+    def assertModified(self, etags):
+        for url, etag in zip(self.urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_owner_rename_changes_etags(self):
+        etags = self.get_etags()
+        self.owner.username = 'renamed'
+        self.owner.save()
+        self.assertModified(etags)
+        self.assertEqual(self.client.get(self.urls[1]).data['owner']['username'], 'renamed')
+
+    def test_collection_rename_changes_etags(self):
+        etags = self.get_etags()
+        self.collection.label = 'Science'
+        self.collection.save()
+        self.assertModified(etags)
+        self.assertEqual(self.client.get(self.urls[1]).data['collection_name'], 'Science')
+
+    def test_login_keeps_cached_lists(self):
+        self.get_etags()
+        self.client.login(email='owner@example.com', password='secret')
+        self.client.logout()
+        self.assertEqual(self.client.get('/blog/')['X-Cache'], 'HIT')
+
+
+class PostTransferTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.posts = [Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                          owner=self.owner, collection=self.collection, is_private=i == 1)
+                      for i in range(3)]
+        TaggedItem.objects.create(tag=Tag.objects.create(label='django'),
+                                  content_type=ContentType.objects.get_for_model(Post), object_id=self.posts[0].pk)
+
+    def export(self, *args):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        call_command('export_posts', *args, batch_size=2, stdout=stdout, stderr=stderr)
+        self.assertIn('3 posts exported', stderr.getvalue())
+        return stdout.getvalue()
+
+    def import_file(self, data, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as stream:
+            stream.write(data)
+        self.addCleanup(os.remove, stream.name)
+        stdout = io.StringIO()
+        call_command('import_posts', stream.name, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_export_writes_jsonl_to_stdout(self):
+        records = [json.loads(line) for line in self.export().splitlines()]
+        self.assertEqual([record['post_id'] for record in records], [post.pk for post in self.posts])
+        self.assertEqual(records[0]['tags'], ['django'])
+        self.assertEqual(records[0]['owner'], {'email': 'owner@example.com', 'username': 'owner'})
+
+    def test_round_trip_keeping_ids(self):
+        data = self.export()
+        expected = [(post.pk, post.title, post.is_private) for post in self.posts]
+        Post.objects.filter(pk=self.posts[0].pk).update(title='Edited')
+        self.posts[2].delete()
+
+        self.assertIn('1 posts created, 2 updated', self.import_file(data, '--keep-ids'))
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('pk', 'title', 'is_private')), expected)
+        self.assertEqual([item.tag.label for item in TaggedItem.objects.get_tags_for(Post, self.posts[0].pk)],
+                         ['django'])
+
+    def test_records_without_timestamps_keep_the_stored_ones(self):
+        records = [json.loads(line) for line in self.export().splitlines()]
+        for record in records:
+            del record['created_at'], record['updated_at']
+            record['title'] = 'Imported'
+        stored = list(Post.objects.order_by('pk').values_list('created_at', 'updated_at'))[1:]
+
+        self.assertIn('0 posts created, 3 updated',
+                      self.import_file(''.join(json.dumps(record) + '\n' for record in records), '--keep-ids'))
+        # The first post's tags are replaced, which moves its updated_at on.
+        self.assertEqual(list(Post.objects.order_by('pk').values_list('created_at', 'updated_at'))[1:], stored)
+        self.assertEqual(set(Post.objects.values_list('title', flat=True)), {'Imported'})
+
+    def test_invalid_rows_raise_a_command_error(self):
+        record = json.loads(self.export().splitlines()[0])
+        record.update(post_id=None, title=None)
+        with self.assertRaisesMessage(CommandError, 'Invalid record, the batch was rolled back'):
+            self.import_file(json.dumps(record) + '\n')
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_round_trip_creates_new_posts(self):
+        self.assertIn('3 posts created, 0 updated', self.import_file(self.export()))
+        self.assertEqual(Post.objects.filter(title='Post 0').count(), 2)
+        self.assertEqual(User.objects.filter(email='owner@example.com').count(), 1)
+
+
+@override_settings(BLOG_EXPORT_CHUNK_SIZE=2)
+class NdjsonExportTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.reader = User.objects.create_user(email='reader@example.com', username='reader', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.own = [self.create_post(self.reader, f'Own {i}', is_private=i == 0) for i in range(3)]
+        self.public = self.create_post(self.owner, 'Public')
+        self.private = self.create_post(self.owner, 'Private', is_private=True)
+        for post in (self.public, self.private, self.own[0]):
+            SavedPost.objects.create(user=self.reader, post=post)
+        like_post(self.reader, self.public.pk)
+
+    def create_post(self, owner, title, is_private=False):
+        return Post.objects.create(title=title, description='Description', content='<p>Content</p>',
+                                   owner=owner, collection=self.collection, is_private=is_private)
+
+    def export(self, **params):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get('/blog/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return response, [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_own_scope(self):
+        response, rows = self.export()
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="posts.ndjson"')
+        self.assertEqual([row['post_id'] for row in rows], [post.pk for post in reversed(self.own)])
+        self.assertTrue(rows[-1]['is_private'])
+        self.assertEqual(self.export(scope='own')[1], rows)
+
+    def test_saved_scope(self):
+        response, rows = self.export(scope='saved')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="saved-posts.ndjson"')
+        # Another user's private post is left out even if it was saved.
+        self.assertEqual([row['post_id'] for row in rows], [self.own[0].pk, self.public.pk])
+        self.assertEqual([row['liked_status'] for row in rows], [False, True])
+        self.assertTrue(all(row['saved_at'] for row in rows))
+
+    def test_invalid_scope_and_anonymous(self):
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.client.get('/blog/export/', {'scope': 'all'}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/blog/export/').status_code, 401)
+
+
+class TagCloudTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        self.django, self.draft = Tag.objects.create(label='django'), Tag.objects.create(label='draft')
+        self.public = self.create_post(is_private=False, tags=[self.django])
+        self.private = self.create_post(is_private=True, tags=[self.django, self.draft])
+        # Tags on other content types are not counted either.
+        TaggedItem.objects.create(tag=self.draft, content_type=ContentType.objects.get_for_model(User),
+                                  object_id=self.owner.pk)
+
+    def create_post(self, is_private, tags):
+        post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                   owner=self.owner, collection=self.collection, is_private=is_private)
+        for tag in tags:
+            TaggedItem.objects.create(tag=tag, content_type=ContentType.objects.get_for_model(Post), object_id=post.pk)
+        return post
+
+    def get_counts(self):
+        return dict(Tag.objects.values_list('label', 'items_count'))
+
+    def test_only_public_posts_are_counted(self):
+        self.assertEqual(self.get_counts(), {'django': 1, 'draft': 0})
+        self.assertEqual(self.client.get('/tags/cloud/').data, [{'id': self.django.pk, 'label': 'django', 'count': 1}])
+
+    def test_counts_follow_visibility_and_deletes(self):
+        self.private.is_private = False
+        self.private.save()
+        self.assertEqual(self.get_counts(), {'django': 2, 'draft': 1})
+
+        self.public.is_private = True
+        self.public.save()
+        self.assertEqual(self.get_counts(), {'django': 1, 'draft': 1})
+
+        self.private.delete()
+        self.assertEqual(self.get_counts(), {'django': 0, 'draft': 0})
+        TaggedItem.objects.all().delete()
+        self.assertEqual(self.get_counts(), {'django': 0, 'draft': 0})
+
+    def test_refresh_matches_the_signals(self):
+        Tag.objects.update(items_count=7)
+        refresh_tag_counts()
+        self.assertEqual(self.get_counts(), {'django': 1, 'draft': 0})
+
+    def test_limit_is_clamped(self):
+        for limit in ('-5', '0', '1'):
+            response = self.client.get('/tags/cloud/', {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data), 1)
+        self.assertEqual(self.client.get('/tags/cloud/', {'limit': 'ten'}).status_code, 400)
+
+
+@override_settings(BLOG_IMAGE_RENDITIONS={'small': (32, 32), 'medium': (64, 64)}, BLOG_IMAGE_FORMATS=('webp', 'jpeg'))
+class RenditionTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.post = Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                        owner=self.owner, collection=Collection.objects.create(label='Tech'),
+                                        is_private=False, thumbnail=self.make_image('a.png', (100, 50)))
+
+    def make_image(self, name, size, mode='RGBA'):
+        output = io.BytesIO()
+        Image.new(mode, size, 'red').save(output, 'PNG')
+        return SimpleUploadedFile(name, output.getvalue(), content_type='image/png')
+
+    def render(self):
+        images.process(Post, self.post.pk, 'thumbnail', 'thumbnail_renditions')
+        self.post.refresh_from_db()
+        return self.post.thumbnail_renditions
+
+    def get_file_names(self, renditions):
+        return [rendition['name'] for size_name, formats in renditions.items() if size_name != 'source'
+                for rendition in formats.values()]
+
+    def test_renditions_fit_the_sizes_in_every_format(self):
+        self.assertTrue(images.needs_renditions(self.post, 'thumbnail', 'thumbnail_renditions'))
+        renditions = self.render()
+        self.assertEqual(renditions['source'], self.post.thumbnail.name)
+        storage = self.post.thumbnail.storage
+        for size_name, (width, height) in (('small', (32, 16)), ('medium', (64, 32))):
+            for image_format, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                rendition = renditions[size_name][image_format]
+                self.assertEqual((rendition['width'], rendition['height']), (width, height))
+                with storage.open(rendition['name']) as stream, Image.open(stream) as image:
+                    self.assertEqual((image.format, image.size), (pil_format, (width, height)))
+        self.assertFalse(images.needs_renditions(self.post, 'thumbnail', 'thumbnail_renditions'))
+        self.assertTrue(images.get_rendition_url(self.post.thumbnail, renditions, 'small')
+                        .endswith('.small.webp'))
+
+    def test_replaced_image_gets_new_renditions(self):
+        previous = self.get_file_names(self.render())
+        self.post.thumbnail = self.make_image('b.png', (40, 80), mode='P')
+        self.post.save()
+        self.assertTrue(images.needs_renditions(self.post, 'thumbnail', 'thumbnail_renditions'))
+
+        renditions = self.render()
+        storage = self.post.thumbnail.storage
+        self.assertEqual(renditions['source'], self.post.thumbnail.name)
+        self.assertEqual(renditions['small']['jpeg']['height'], 32)
+        self.assertFalse([name for name in previous if storage.exists(name)])
+        self.assertTrue(all(storage.exists(name) for name in self.get_file_names(renditions)))
+
+    def test_generate_renditions_command(self):
+        self.owner.profile_picture = self.make_image('me.png', (50, 50))
+        self.owner.save()
+
+        def generate(*args):
+            output = io.StringIO()
+            call_command('generate_renditions', *args, stdout=output)
+            return output.getvalue()
+
+        self.assertIn('1 posts rendered.\n1 users rendered.', generate())
+        self.post.refresh_from_db()
+        self.owner.refresh_from_db()
+        self.assertEqual(self.post.thumbnail_renditions['source'], self.post.thumbnail.name)
+        self.assertEqual(self.owner.profile_picture_renditions['small']['webp']['width'], 32)
+        self.assertIn('0 posts rendered.\n0 users rendered.', generate())
+        self.assertIn('1 posts rendered.\n1 users rendered.', generate('--force'))
+
+
+class SavedPostListTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.reader = User.objects.create_user(email='reader@example.com', username='reader', password='secret')
+        self.tech = Collection.objects.create(label='Tech')
+        self.art = Collection.objects.create(label='Art')
+        self.saved = []
+        for i in range(22):
+            post = Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                       owner=self.reader if i == 0 else self.owner,
+                                       collection=self.art if i % 3 else self.tech,
+                                       # The reader's own private post is listed, others' are not.
+                                       is_private=i in (0, 1))
+            SavedPost.objects.create(user=self.reader, post=post)
+            if i != 1:
+                self.saved.append(post)
+        self.saved.reverse()
+        self.client.force_authenticate(self.reader)
+
+    def test_pages_are_ordered_by_save_time(self):
+        first = self.client.get('/blog/saved/').data
+        self.assertEqual(len(first['results']), 20)
+        second = self.client.get(first['next']).data
+        self.assertIsNone(second['next'])
+        self.assertEqual([row['post']['post_id'] for row in first['results'] + second['results']],
+                         [post.pk for post in self.saved])
+
+        self.assertEqual(first['collections'], [{'id': self.art.pk, 'label': 'Art', 'count': 13},
+                                                {'id': self.tech.pk, 'label': 'Tech', 'count': 8}])
+        self.assertNotIn('collections', second)
+
+    def test_collection_filter(self):
+        data = self.client.get('/blog/saved/', {'collection': self.tech.pk}).data
+        self.assertEqual([row['post']['post_id'] for row in data['results']],
+                         [post.pk for post in self.saved if post.collection == self.tech])
+        self.assertIsNone(data['next'])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/blog/saved/').status_code, 401)
+
+
+class FastSimplePostSerializerTests(APITestCase):
+    def test_same_output_as_simple_post_serializer(self):
+        owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        collection = Collection.objects.create(label='Tech')
+        Post.objects.create(title='Plain', description='Description', content='<p>Content</p>',
+                            owner=owner, collection=collection)
+        Post.objects.create(title='Illustrated', description='Description', content='<p>Content</p>',
+                            owner=owner, collection=collection, thumbnail='blogs/thumbnail/a.png',
+                            thumbnail_renditions={'source': 'blogs/thumbnail/a.png',
+                                                  'small': {'webp': {'name': 'blogs/thumbnail/renditions/a.small.webp',
+                                                                     'width': 320, 'height': 180}}})
+        posts = list(Post.objects.select_related('owner', 'collection').order_by('pk'))
+        context = {'request': Request(APIRequestFactory().get('/blog/'))}
+
+        expected = SimplePostSerializer(posts, many=True, context=context).data
+        self.assertEqual(FastSimplePostSerializer(posts, many=True, context=context).data,
+                         [dict(row) for row in expected])
+        self.assertTrue(expected[1]['thumbnail'].endswith('a.small.webp'))
+
+
+class FollowGraphTests(APITestCase):
+    def setUp(self):
+        self.alice, self.bob, self.carol = [User.objects.create_user(email=f'{name}@example.com', username=name,
+                                                                     password='secret')
+                                            for name in ('alice', 'bob', 'carol')]
+
+    def test_counts_and_relationships(self):
+        self.client.force_authenticate(self.alice)
+        for user in (self.bob, self.carol):
+            self.assertEqual(self.client.post('/users/follow/', {'following': user.pk}).status_code, 201)
+        self.assertEqual(self.client.post('/users/follow/', {'following': self.bob.pk}).status_code, 409)
+        Follow.objects.create(follower=self.bob, following=self.alice)
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.followers_count, self.alice.following_count), (1, 2))
+        self.assertEqual((self.bob.followers_count, self.bob.following_count), (1, 1))
+
+        followings = self.client.get('/users/follow/').data['results']
+        self.assertEqual([(user['id'], user['is_following'], user['follows_you']) for user in followings],
+                         [(self.carol.pk, True, False), (self.bob.pk, True, True)])
+        self.assertEqual([user['id'] for user in self.client.get('/users/follow/mutuals/').data['results']],
+                         [self.bob.pk])
+
+        self.assertEqual(self.client.delete(f'/users/follower/{self.bob.pk}/').status_code, 204)
+        self.assertEqual(self.client.delete(f'/users/follower/{self.bob.pk}/').status_code, 404)
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.followers_count, self.bob.following_count), (1, 0))
+
+
+class SuggestedAuthorTests(APITestCase):
+    def test_friends_of_friends_and_liked_authors(self):
+        alice, bob, carol, dave = [User.objects.create_user(email=f'{name}@example.com', username=name,
+                                                            password='secret')
+                                   for name in ('alice', 'bob', 'carol', 'dave')]
+        collection = Collection.objects.create(label='Tech')
+        posts = {user: Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                           owner=user, collection=collection, is_private=False)
+                 for user in (bob, carol, dave)}
+        Follow.objects.create(follower=alice, following=bob)
+        Follow.objects.create(follower=bob, following=carol)
+        like_post(alice, posts[dave].pk)
+
+        call_command('build_suggested_authors', stdout=io.StringIO())
+
+        self.client.force_authenticate(alice)
+        response = self.client.get('/users/suggested/')
+        self.assertEqual([row['author']['id'] for row in response.data], [carol.pk, dave.pk])
+
+        Follow.objects.create(follower=alice, following=carol)
+        self.assertEqual([row['author']['id'] for row in self.client.get('/users/suggested/').data], [dave.pk])
+
+
+class RelatedPostTests(APITestCase):
+    def create_post(self, title, tags=(), is_private=False):
+        post = Post.objects.create(title=title, description='Description', content='<p>Content</p>',
+                                   owner=self.owner, collection=self.collection, is_private=is_private)
+        for label in tags:
+            TaggedItem.objects.create(tag=Tag.objects.get_or_create(label=label)[0],
+                                      content_type=ContentType.objects.get_for_model(Post), object_id=post.pk)
+        return post
+
+    def get_related(self, post):
+        response = self.client.get(f'/blog/detail/{post.pk}/related/')
+        self.assertEqual(response.status_code, 200)
+        return [row['post_id'] for row in response.data]
+
+    def test_related_posts(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        django = self.create_post('Django query performance', tags=['django', 'sql'])
+        orm = self.create_post('Django ORM performance', tags=['django', 'sql'])
+        tips = self.create_post('Django tips', tags=['django'])
+        self.create_post('Django query performance drafts', tags=['django', 'sql'], is_private=True)
+        self.create_post('Gardening')
+        like_post(self.owner, django.pk)
+        like_post(self.owner, tips.pk)
+
+        call_command('build_related_posts', stdout=io.StringIO())
+        # Tips shares fewer tags and words but is liked by the same user.
+        self.assertEqual(self.get_related(django), [tips.pk, orm.pk])
+
+        # Only the changed post and its neighbours are recomputed.
+        tagged = self.create_post('Query performance', tags=['sql'])
+        output = io.StringIO()
+        call_command('build_related_posts', stdout=output)
+        self.assertIn('for 3 posts', output.getvalue())
+        self.assertEqual(self.get_related(tagged), [django.pk, orm.pk])
+        self.assertIn(tagged.pk, self.get_related(django))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are asserted in SQLite EXPLAIN QUERY PLAN format.')
+class HotQueryIndexTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        self.reader = User.objects.create_user(email='reader@example.com', username='reader', password='secret')
+        self.collection = Collection.objects.create(label='Tech')
+        for i in range(5):
+            Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                owner=self.owner, collection=self.collection, is_private=i % 2 == 0)
+        Follow.objects.create(follower=self.reader, following=self.owner)
+
+    def get_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, plan, table):
+        steps = [step for step in plan if f' {table} ' in f'{step} ']
+        self.assertTrue(steps, f'{table} is not read in {plan}')
+        for step in steps:
+            self.assertRegex(step, r'USING (COVERING )?(INDEX|INTEGER PRIMARY KEY)', f'{table} is scanned in {plan}')
+
+    def assertPostQueriesUseIndex(self, url, authenticate=True, table='blog_post'):
+        if authenticate:
+            self.client.force_authenticate(self.reader)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # The page query of the endpoint, not the pagination COUNT(*).
+        page_queries = [query['sql'] for query in queries.captured_queries
+                        if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql'] and 'LIMIT' in query['sql']]
+        self.assertTrue(page_queries, f'No {table} query for {url}')
+        for sql in page_queries:
+            plan = self.get_plan(sql)
+            self.assertUsesIndex(plan, table)
+            # Rows come in index order, LIMIT stops the scan instead of sorting every match.
+            self.assertFalse([step for step in plan if 'USE TEMP B-TREE' in step], f'{url} is sorted in {plan}')
+
+    def test_public_feed_uses_index(self):
+        self.assertPostQueriesUseIndex('/blog/', authenticate=False)
+
+    def test_feed_uses_index(self):
+        self.assertPostQueriesUseIndex('/blog/')
+
+    def test_collection_feed_uses_index(self):
+        self.assertPostQueriesUseIndex(f'/blog/?collection={self.collection.pk}')
+
+    def test_popular_uses_index(self):
+        self.assertPostQueriesUseIndex('/blog/popular/')
+
+    def test_own_posts_use_index(self):
+        self.assertPostQueriesUseIndex('/blog/owns/')
+
+    def test_saved_posts_use_index(self):
+        for post in Post.objects.filter(is_private=False):
+            SavedPost.objects.create(user=self.reader, post=post)
+        self.assertPostQueriesUseIndex('/blog/saved/', table='blog_savedpost')
+
+    def test_tag_filter_uses_index(self):
+        tag = Tag.objects.create(label='django')
+        post = Post.objects.filter(is_private=False).first()
+        TaggedItem.objects.create(tag=tag, content_type=ContentType.objects.get_for_model(Post), object_id=post.pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/blog/?tag=django')
+        self.assertEqual(response.status_code, 200)
+        sql = next(query['sql'] for query in queries.captured_queries if 'FROM "blog_post"' in query['sql'])
+        self.assertIn('tags_taggeditem_tag_ct_idx', ' '.join(self.get_plan(sql)))
+
+    def test_follow_lists_use_index(self):
+        self.assertPostQueriesUseIndex('/users/follow/', table='blog_follow')
+        self.client.force_authenticate(self.owner)
+        self.assertPostQueriesUseIndex('/users/follower/', authenticate=False, table='blog_follow')
+
+    def test_suggested_authors_use_index(self):
+        self.assertPostQueriesUseIndex('/users/suggested/', table='blog_suggestedauthor')
+
+    def test_related_posts_use_index(self):
+        post = Post.objects.filter(is_private=False).first()
+        self.assertPostQueriesUseIndex(f'/blog/detail/{post.pk}/related/', table='blog_relatedpost')
+
+    def test_followed_feed_uses_index(self):
+        timeline.add_following(self.reader.pk, self.owner.pk)
+        self.assertPostQueriesUseIndex('/blog/followed/', table='blog_timelineentry')
+
+    def test_detail_uses_primary_key(self):
+        self.assertPostQueriesUseIndex(f'/blog/detail/{Post.objects.filter(is_private=False).first().pk}/')
+
+    def test_follow_pair_lookup_uses_index(self):
+        queryset = Follow.objects.filter(follower=self.reader, following=self.owner)
+        self.assertUsesIndex(self.get_plan(str(queryset.query)), 'blog_follow')
+
+    def test_tagged_item_lookup_uses_index(self):
+        queryset = TaggedItem.objects.get_tags_for(Post, 1)
+        self.assertIn('tags_taggeditem_object_idx', queryset.explain())
+
+
+class ViewsCountMigrationTests(TransactionTestCase):
+    # The apps the Post, User and HitCount rows below need.
+    DEPENDENCIES = (('core', '0005_user_profile_picture_renditions'), ('hitcount', '0004_auto_20200704_0933'))
+
+    def migrate(self, *targets):
+        targets += self.DEPENDENCIES
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(list(targets))
+        return executor.loader.project_state(list(targets)).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_views_count_and_popularity_are_backfilled(self):
+        apps = self.migrate(('blog', '0010_follow'))
+        User = apps.get_model('core', 'User')
+        Collection = apps.get_model('blog', 'Collection')
+        Post = apps.get_model('blog', 'Post')
+        ContentType = apps.get_model('contenttypes', 'ContentType')
+        HitCount = apps.get_model('hitcount', 'HitCount')
+
+        owner = User.objects.create(email='owner@example.com', username='owner')
+        collection = Collection.objects.create(label='Tech')
+        viewed, unviewed = [Post.objects.create(title='Title', description='Description', content='<p>Content</p>',
+                                                owner=owner, collection=collection) for _ in range(2)]
+        content_type, _ = ContentType.objects.get_or_create(app_label='blog', model='post')
+        HitCount.objects.create(content_type=content_type, object_pk=viewed.pk, hits=8)
+        Post.objects.filter(pk=viewed.pk).update(likes_count=2)
+
+        apps = self.migrate(('blog', '0011_post_views_count'))
+        Post = apps.get_model('blog', 'Post')
+        self.assertEqual(Post.objects.get(pk=viewed.pk).views_count, 8)
+        self.assertEqual(Post.objects.get(pk=unviewed.pk).views_count, 0)
+
+        apps = self.migrate(('blog', '0012_post_popularity'))
+        Post = apps.get_model('blog', 'Post')
+        self.assertEqual(Post.objects.get(pk=viewed.pk).popularity, 0.25)
+        self.assertEqual(Post.objects.get(pk=unviewed.pk).popularity, 0)
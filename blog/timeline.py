@@ -0,0 +1,131 @@
+"""
+Materialized home timeline for /blog/followed/.
+
+Public posts are fanned out on write into ``TimelineEntry`` rows for every
+follower of the author, so reading the feed is a lookup on the reader's own
+entries. Authors with more than ``BLOG_TIMELINE_FANOUT_LIMIT`` followers are
+not fanned out; their posts are merged in at read time instead. When one
+drops back under the limit, the timelines of its followers are backfilled.
+
+A page is read straight from the reader's entries, ordered like
+``blog_timeline_user_idx``, plus one bounded query on the posts of the
+followed heavy authors (see ``TimelinePagination``).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Q
+from .models import Follow, Post, TimelineEntry
+
+HEAVY_AUTHORS_CACHE_KEY = 'blog:timeline:heavy-authors'
+
+
+def get_fanout_limit():
+    return getattr(settings, 'BLOG_TIMELINE_FANOUT_LIMIT', 5000)
+
+
+def get_heavy_author_ids():
+    """
+    Ids of the authors whose posts are read on demand instead of fanned out.
+    """
+    author_ids = cache.get(HEAVY_AUTHORS_CACHE_KEY)
+    if author_ids is None:
+        author_ids = set(get_user_model().objects
+                         .filter(followers_count__gt=get_fanout_limit())
+                         .values_list('pk', flat=True))
+        cache.set(HEAVY_AUTHORS_CACHE_KEY, author_ids, getattr(settings, 'BLOG_TIMELINE_HEAVY_AUTHORS_TTL', 600))
+    return author_ids
+
+
+def get_heavy_following_ids(user):
+    heavy_author_ids = get_heavy_author_ids()
+    if not heavy_author_ids:
+        return []
+    return list(Follow.objects
+                .filter(follower=user, following_id__in=heavy_author_ids)
+                .values_list('following_id', flat=True))
+
+
+def get_timeline_querysets(user, posts):
+    """
+    The sources of the timeline of `user`: its TimelineEntry rows, with their
+    post selected, and the public posts of the heavy authors it follows.
+    Both are restricted to `posts` when it is filtered.
+    """
+    # Entries of a post made private are only removed by a task, it may not have run yet.
+    entries = TimelineEntry.objects \
+        .filter(user=user, post__is_private=False) \
+        .select_related('post__owner', 'post__collection')
+    if posts.query.where:
+        entries = entries.filter(post__in=posts.values('pk'))
+
+    querysets = [entries]
+    heavy_following_ids = get_heavy_following_ids(user)
+    if heavy_following_ids:
+        querysets.append(posts.filter(owner_id__in=heavy_following_ids, is_private=False))
+    return querysets
+
+
+def get_timeline_filter(user):
+    """
+    The timeline of `user` as a filter on Post, for orderings the entries
+    can not serve (e.g. search ranking).
+    """
+    return Q(pk__in=TimelineEntry.objects.filter(user=user).values('post_id'), is_private=False) \
+        | Q(owner_id__in=get_heavy_following_ids(user), is_private=False)
+
+
+def fan_out_post(post):
+    """
+    Push a public post into the timeline of every follower of its author.
+    """
+    if post.is_private or post.owner_id in get_heavy_author_ids():
+        return
+
+    batch_size = getattr(settings, 'BLOG_TIMELINE_BATCH_SIZE', 1000)
+    follower_ids = Follow.objects.filter(following_id=post.owner_id).values_list('follower_id', flat=True)
+    batch = []
+    for follower_id in follower_ids.iterator(chunk_size=batch_size):
+        batch.append(TimelineEntry(user_id=follower_id, post_id=post.pk, created_at=post.created_at))
+        if len(batch) >= batch_size:
+            TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def retract_post(post):
+    TimelineEntry.objects.filter(post_id=post.pk).delete()
+
+
+def add_following(follower_id, following_id):
+    """
+    Backfill the latest public posts of a newly followed author.
+    """
+    if following_id in get_heavy_author_ids():
+        return
+
+    posts = Post.objects \
+        .filter(owner_id=following_id, is_private=False) \
+        .order_by('-created_at') \
+        .values_list('pk', 'created_at')[:getattr(settings, 'BLOG_TIMELINE_BACKFILL', 200)]
+    TimelineEntry.objects.bulk_create([TimelineEntry(user_id=follower_id, post_id=post_id, created_at=created_at)
+                                       for post_id, created_at in posts],
+                                      ignore_conflicts=True)
+
+
+def backfill_followers(author_id):
+    """
+    Backfill the timelines of every follower of an author who is no longer
+    heavy: the posts published while heavy were never fanned out.
+    """
+    cache.delete(HEAVY_AUTHORS_CACHE_KEY)
+    if author_id in get_heavy_author_ids():
+        return
+
+    follower_ids = Follow.objects.filter(following_id=author_id).values_list('follower_id', flat=True)
+    for follower_id in follower_ids.iterator(chunk_size=getattr(settings, 'BLOG_TIMELINE_BATCH_SIZE', 1000)):
+        add_following(follower_id, author_id)
+
+
+def remove_following(follower_id, following_id):
+    TimelineEntry.objects.filter(user_id=follower_id, post__owner_id=following_id).delete()
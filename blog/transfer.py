@@ -0,0 +1,207 @@
+"""
+JSONL import and export of posts for `manage.py import_posts` / `export_posts`.
+
+Every line is one post with its author, collection and tags inlined::
+
+    {"post_id": 1, "title": "...", "description": "...", "content": "...",
+     "thumbnail": null, "is_private": false, "status": 2,
+     "approved_at": "...", "created_at": "...", "updated_at": "...",
+     "owner": {"email": "...", "username": "..."}, "collection": "Tech",
+     "tags": ["django"]}
+
+Both directions work in batches so memory stays bounded by the batch size.
+Authors are matched by email, collections and tags by label; missing ones
+are created. Counters (likes, views) are not carried over.
+"""
+import json
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+from tags.models import Tag, TaggedItem
+from . import cache, timeline
+from .models import Collection, Post
+from .search import get_search_backend
+from .tagging import refresh_tag_counts
+
+User = get_user_model()
+
+POST_FIELDS = ('title', 'description', 'content', 'thumbnail', 'is_private', 'status',
+               'approved_at', 'created_at', 'updated_at', 'owner', 'collection')
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def serialize_post(post, tags):
+    return {
+        'post_id': post.pk,
+        'title': post.title,
+        'description': post.description,
+        'content': post.content,
+        'thumbnail': post.thumbnail.name or None,
+        'is_private': post.is_private,
+        'status': post.status,
+        'approved_at': _isoformat(post.approved_at),
+        'created_at': _isoformat(post.created_at),
+        'updated_at': _isoformat(post.updated_at),
+        'owner': {'email': post.owner.email, 'username': post.owner.username},
+        'collection': post.collection.label,
+        'tags': tags,
+    }
+
+
+def export_posts(stream, queryset=None, batch_size=500):
+    """
+    Write the posts of `queryset` to `stream` as JSONL, ordered by id.
+    Returns the number of posts written.
+    """
+    queryset = (queryset if queryset is not None else Post.objects.all()) \
+        .select_related('owner', 'collection') \
+        .order_by('pk')
+    last_pk = 0
+    exported = 0
+
+    while True:
+        posts = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not posts:
+            break
+        last_pk = posts[-1].pk
+
+        TaggedItem.objects.load_for(posts)
+        stream.write(''.join(json.dumps(serialize_post(post, [item.tag.label for item in post.tagged_items])) + '\n'
+                             for post in posts))
+        exported += len(posts)
+
+    return exported
+
+
+def read_batches(lines, batch_size):
+    batch = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            batch.append(json.loads(line))
+        except ValueError as e:
+            raise ValueError(f'Line {number}: {e}') from e
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PostImporter:
+    """
+    Creates (or with `keep_ids`, creates or updates) posts from JSONL records.
+    Owners, collections and tags are resolved through in-memory maps that
+    are filled as batches come in.
+    """
+
+    def __init__(self, batch_size=500, keep_ids=False):
+        self.batch_size = batch_size
+        self.keep_ids = keep_ids
+        self.owners = {}
+        self.collections = {}
+        self.tags = {}
+        self.content_type = ContentType.objects.get_for_model(Post)
+        self.created = self.updated = 0
+
+    def run(self, lines, on_batch=None):
+        for records in read_batches(lines, self.batch_size):
+            with transaction.atomic():
+                self.import_batch(records)
+            if on_batch is not None:
+                on_batch(self)
+
+        if self.keep_ids:
+            # Rows inserted with explicit ids leave sequences (e.g. on PostgreSQL) behind.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                    cursor.execute(sql)
+        cache.invalidate_for('collection')
+
+    def resolve_owners(self, records):
+        owners = {record['owner']['email']: record['owner'] for record in records}
+        missing = [email for email in owners if email not in self.owners]
+        self.owners.update(User.objects.filter(email__in=missing).values_list('email', 'pk'))
+
+        new_users = [User(email=email, username=owners[email].get('username') or email.split('@')[0])
+                     for email in missing if email not in self.owners]
+        for user in new_users:
+            user.set_unusable_password()
+        User.objects.bulk_create(new_users, batch_size=self.batch_size)
+        self.owners.update(User.objects.filter(email__in=[user.email for user in new_users]).values_list('email', 'pk'))
+
+    def resolve_labels(self, model, labels, mapping):
+        missing = {label for label in labels if label not in mapping}
+        if not missing:
+            return
+        for label, pk in model.objects.filter(label__in=missing).order_by('-pk').values_list('label', 'pk'):
+            mapping[label] = pk
+        model.objects.bulk_create([model(label=label) for label in missing if label not in mapping])
+        mapping.update(model.objects.filter(label__in=missing - mapping.keys()).values_list('label', 'pk'))
+
+    def build_post(self, record):
+        post = Post(title=record['title'],
+                    description=record['description'],
+                    content=record['content'],
+                    thumbnail=record.get('thumbnail') or None,
+                    is_private=record.get('is_private', True),
+                    status=record.get('status', Post.NOT_REQUESTED),
+                    approved_at=parse_datetime(record['approved_at']) if record.get('approved_at') else None,
+                    owner_id=self.owners[record['owner']['email']],
+                    collection_id=self.collections[record['collection']])
+        if self.keep_ids:
+            post.pk = record['post_id']
+        post.created_at = parse_datetime(record['created_at']) if record.get('created_at') else None
+        post.updated_at = parse_datetime(record['updated_at']) if record.get('updated_at') else None
+        return post
+
+    def import_batch(self, records):
+        self.resolve_owners(records)
+        self.resolve_labels(Collection, {record['collection'] for record in records}, self.collections)
+        self.resolve_labels(Tag, {tag for record in records for tag in record.get('tags', ())}, self.tags)
+
+        posts = [self.build_post(record) for record in records]
+        existing = {pk: (created_at, updated_at) for pk, created_at, updated_at in Post.objects
+                    .filter(pk__in=[post.pk for post in posts])
+                    .values_list('pk', 'created_at', 'updated_at')} if self.keep_ids else {}
+        to_create = [post for post in posts if post.pk not in existing]
+        to_update = [post for post in posts if post.pk in existing]
+        # Records without timestamps keep the stored ones.
+        for post in to_update:
+            created_at, updated_at = existing[post.pk]
+            post.created_at = post.created_at or created_at
+            post.updated_at = post.updated_at or updated_at
+
+        # bulk_create applies auto_now(_add); the exported timestamps are put back with bulk_update.
+        timestamps = [(post.created_at, post.updated_at) for post in to_create]
+        Post.objects.bulk_create(to_create, batch_size=self.batch_size)
+        for post, (created_at, updated_at) in zip(to_create, timestamps):
+            post.created_at = created_at or post.created_at
+            post.updated_at = updated_at or post.updated_at
+        Post.objects.bulk_update(to_create, ['created_at', 'updated_at'], batch_size=self.batch_size)
+        Post.objects.bulk_update(to_update, POST_FIELDS, batch_size=self.batch_size)
+
+        replaced = TaggedItem.objects.filter(content_type=self.content_type, object_id__in=[post.pk for post in to_update])
+        replaced_tag_ids = set(replaced.values_list('tag_id', flat=True))
+        replaced.delete()
+        TaggedItem.objects.bulk_create([TaggedItem(tag_id=self.tags[label], content_type=self.content_type, object_id=post.pk)
+                                        for post, record in zip(posts, records) for label in record.get('tags', ())],
+                                       batch_size=self.batch_size)
+        refresh_tag_counts(replaced_tag_ids | {self.tags[label] for record in records for label in record.get('tags', ())})
+
+        # bulk_create skips the Post signals, so do their work here.
+        get_search_backend().update(posts)
+        for post in posts:
+            if post.is_private:
+                timeline.retract_post(post)
+            else:
+                timeline.fan_out_post(post)
+
+        self.created += len(to_create)
+        self.updated += len(to_update)
@@ -13,9 +13,11 @@ router.register('domain', views.CollectionViewSet, basename='collections')
 router.register('blog/detail', views.PostDetailViewSet, basename='post-detail')
 router.register('blog/popular', views.PopularPostViewSet, basename='post-popular')
 router.register('blog/owns', views.OwnPostViewSet, basename='post-owns')
+router.register('blog/saved', views.SavedPostViewSet, basename='post-saved')
 router.register('blog/followed', views.FollowingsPostViewSet, basename='post-following')
 router.register('users/follow', views.FollowViewSet, basename='user-following')
 router.register('users/follower', views.FollowerViewSet, basename='user-followers')
+router.register('users/suggested', views.SuggestedAuthorViewSet, basename='user-suggested')
 
 urlpatterns = [
     path('', include(router.urls)),
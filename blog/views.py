@@ -1,38 +1,75 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.contrib.contenttypes.models import ContentType
-from django.db.models import ExpressionWrapper, BooleanField, Value, Q, Subquery, OuterRef, Case, FloatField, When
-from django.db.models.functions import Cast
-from django.shortcuts import get_object_or_404
+from django.db.models import Count, Exists, OuterRef, Q, F
 from django_filters.rest_framework import DjangoFilterBackend
-from hitcount.models import HitCount
 from hitcount.utils import get_hitcount_model
 from hitcount.views import HitCountMixin
-from rest_framework import serializers, status, filters
+from rest_framework import serializers, status
 from rest_framework.mixins import ListModelMixin, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin, DestroyModelMixin
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly, SAFE_METHODS
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet, ViewSet
-from .filters import PostFilter, OwnPostFilter
-from .models import Post, SavedPost, Collection, Follow
-from .pagination import PostPagination, PopularPostPagination, FollowListPagination
+from tags.models import TaggedItem
+from .cache import AnonymousListCacheMixin, get_post_payload
+from .conditional import ConditionalListMixin, check_not_modified, get_validators, set_validators
+from .filters import PostFilter, OwnPostFilter, PostSearchFilter, SavedPostFilter
+from .follows import follow, get_followers, get_followings, get_mutuals, get_relationships, unfollow
+from .hits import buffering_enabled, hit_buffer
+from .likes import get_like_model, like_post, toggle_like, unlike_post
+from .models import Post, SavedPost, Collection, Follow, RelatedPost, SuggestedAuthor
+from .pagination import PostCursorPagination, PopularPostPagination, FollowListPagination, SavedPostPagination, TimelinePagination
 from .permissions import IsOwnerOrReadOnly
-from .serializers import PostSerializer, SimplePostSerializer, CollectionSerializer, SimpleUserSerializer, FollowUserSerializer, FollowSerializer
+from .ranking import get_counter_changes, get_gravity
+from .related import get_related_size
+from .streaming import ndjson_response
+from .suggestions import get_suggestions_size
+from .tasks import refresh_post_popularity
+from .serializers import PostSerializer, SimplePostSerializer, CollectionSerializer, FollowUserSerializer, FollowSerializer, FollowListUserSerializer, SavedPostListSerializer, SuggestedAuthorSerializer, FastSimplePostSerializer
 
 User = get_user_model()
 
-class PostListViewSet(ListModelMixin, CreateModelMixin, GenericViewSet):
+
+def load_saved_posts(saved_posts):
+    TaggedItem.objects.load_for([saved_post.post for saved_post in saved_posts])
+
+
+class TaggedPageMixin:
+    """
+    Load the tags of every post of a page in one query.
+    """
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            TaggedItem.objects.load_for(page)
+        return page
+
+
+class FastListMixin:
+    """
+    Serialize `list()` pages with FastSimplePostSerializer when
+    BLOG_FAST_SERIALIZERS is on.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list' and kwargs.get('many') and getattr(settings, 'BLOG_FAST_SERIALIZERS', True):
+            return FastSimplePostSerializer(*args, context=self.get_serializer_context(), **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+
+class PostListViewSet(FastListMixin, TaggedPageMixin, AnonymousListCacheMixin, ConditionalListMixin, ListModelMixin, CreateModelMixin, GenericViewSet):
+    cache_namespace = 'posts'
     serializer_class = PostSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter]
     filterset_class = PostFilter
-    pagination_class = PostPagination
-    search_fields = ['title', 'description']
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
         queryset = Post.objects \
                         .select_related('owner', 'collection') \
-                        .annotate(views=Subquery(HitCount.objects.filter(content_type=ContentType.objects.get_for_model(Post), object_pk=OuterRef('pk')).values('hits'))) \
-                        .order_by('-created_at', '-updated_at') \
+                        .order_by('-created_at', '-updated_at')
         
         if self.request.user.is_authenticated:
             return queryset.filter(Q(is_private=False) | Q(owner=self.request.user))
@@ -53,7 +90,8 @@ class PostListViewSet(ListModelMixin, CreateModelMixin, GenericViewSet):
         return {'request': self.request}
 
     def get_permissions(self):
-        if self.request.method not in SAFE_METHODS:
+        # The saved posts and export actions are per user even though they are GETs.
+        if self.request.method not in SAFE_METHODS or self.action in ['get_saved_posts', 'export']:
             permission_classes = [IsAuthenticated()]  
         else:
             permission_classes = []  
@@ -61,14 +99,52 @@ class PostListViewSet(ListModelMixin, CreateModelMixin, GenericViewSet):
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def get_saved_posts(self, request, pk=None):
+        """
+        Unpaginated list kept for existing clients, see /blog/saved/.
+        """
         post = self.get_queryset()
-        saved_posts = post.prefetch_related('savedpost').filter(savedpost__user__pk=request.user.id)
+        saved_posts = post.filter(savedpost__user__pk=request.user.id)
         collection_param = request.query_params.get('collection')
         if collection_param:
             saved_posts = saved_posts.filter(collection=collection_param)
-        serializer = PostSerializer(saved_posts, many=True, context={'request': request}) 
+        serializer = PostSerializer(TaggedItem.objects.load_for(saved_posts), many=True, context={'request': request}) 
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        Streams the user's own posts (`?scope=own`, the default) or saved posts
+        (`?scope=saved`) as NDJSON, one PostSerializer object per line.
+        Saved posts also carry `saved_at`.
+        """
+        scope = request.query_params.get('scope', 'own')
+        user = request.user
+        serializer = PostSerializer(context={'request': request})
+        likes = get_like_model().objects.filter(user_id=user.id)
+
+        if scope == 'own':
+            posts = Post.objects \
+                .select_related('owner', 'collection') \
+                .annotate(liked=Exists(likes.filter(post_id=OuterRef('pk')))) \
+                .filter(owner=user) \
+                .order_by('-created_at', '-updated_at', 'post_id')
+            return ndjson_response(posts, serializer.to_representation, 'posts.ndjson', TaggedItem.objects.load_for)
+
+        if scope == 'saved':
+            saved = SavedPost.objects \
+                .select_related('post__owner', 'post__collection') \
+                .annotate(liked=Exists(likes.filter(post_id=OuterRef('post_id')))) \
+                .filter(Q(post__is_private=False) | Q(post__owner=user), user=user) \
+                .order_by('-created_at', '-pk')
+
+            def to_representation(saved_post):
+                saved_post.post.liked = saved_post.liked
+                return {**serializer.to_representation(saved_post.post), 'saved_at': saved_post.created_at}
+
+            return ndjson_response(saved, to_representation, 'saved-posts.ndjson', load_saved_posts)
+
+        return Response({'scope': ['Must be "own" or "saved".']}, status=status.HTTP_400_BAD_REQUEST)
+
 
 class PostDetailViewSet(RetrieveModelMixin,
                    UpdateModelMixin,
@@ -79,15 +155,21 @@ class PostDetailViewSet(RetrieveModelMixin,
     
     def get_object(self):
         obj =  super().get_object()
-        object = get_object_or_404(Post, pk=obj.pk)
+        if buffering_enabled():
+            hit_buffer.record(self.request, obj.pk)
+            return obj
+
         context = {}
-        hit_count = get_hitcount_model().objects.get_for_object(object)
+        hit_count = get_hitcount_model().objects.get_for_object(obj)
         hits = hit_count.hits
         hitcontext = context['hitcount'] = {'pk': hit_count.pk}
         hit_count_response = HitCountMixin.hit_count(self.request, hit_count)
         if hit_count_response.hit_counted:
             hits = hits + 1
-            obj.views = obj.views + 1 if obj.views else 1
+            Post.objects.filter(pk=obj.pk).update(**get_counter_changes(views_count=F('views_count') + 1))
+            obj.views_count += 1
+            if get_gravity():
+                refresh_post_popularity.delay_once(post_ids=[obj.pk])
         hitcontext['hit_counted'] = hit_count_response.hit_counted
         hitcontext['hit_message'] = hit_count_response.hit_message
         hitcontext['total_hits'] = hits
@@ -95,18 +177,29 @@ class PostDetailViewSet(RetrieveModelMixin,
 
     def get_queryset(self):
         queryset = Post.objects \
-                        .select_related('owner', 'collection') \
-                        .prefetch_related('liked_by') \
-                        .annotate(views=Subquery(HitCount.objects.filter(content_type=ContentType.objects.get_for_model(Post), object_pk=OuterRef('pk')).values('hits'))) 
+                        .select_related('owner', 'collection')
+
+        if self.action == 'retrieve':
+            # The content is only rendered when the cached payload is stale.
+            queryset = queryset.defer('content')
 
         if self.request.user.is_authenticated:
-            liked_post_ids = Subquery(User.objects.filter(pk=self.request.user.id).values_list('liked_posts__post_id', flat=True))
-            user_liked_post = ExpressionWrapper(Q(pk__in=liked_post_ids), output_field=BooleanField())
+            user_liked_post = Exists(get_like_model().objects.filter(user_id=self.request.user.id, post_id=OuterRef('pk')))
             queryset = queryset.annotate(liked=user_liked_post)
             return queryset.filter(Q(is_private=False) | Q(owner=self.request.user))
         else:
             return queryset.filter(is_private=False)  
 
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag, last_modified = get_validators([instance], getattr(instance, 'liked', False))
+        not_modified = check_not_modified(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(get_post_payload(instance, self.get_serializer_class(), self.get_serializer_context()))
+        return set_validators(response, etag, last_modified)
+
     def get_serializer_context(self):
         if self.request.user.is_authenticated:
             return {
@@ -124,21 +217,23 @@ class PostDetailViewSet(RetrieveModelMixin,
             permission_classes = []  
         return permission_classes
     
-    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=['post', 'put', 'delete'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
+        """
+        POST toggles the like, PUT likes and DELETE unlikes the post.
+        PUT and DELETE are idempotent.
+        """
         post = self.get_object()
         user = request.user
 
-        if post.liked:
-            post.liked_by.remove(user)
-            post.likes_count -= 1
-            post.save()
+        if request.method == 'PUT':
+            like_post(user, post.pk)
+            liked = True
+        elif request.method == 'DELETE':
+            unlike_post(user, post.pk)
             liked = False
         else:
-            post.liked_by.add(user)
-            post.likes_count += 1
-            post.save()
-            liked = True
+            liked = toggle_like(user, post.pk)
 
         return Response({'liked': liked}, status=status.HTTP_200_OK)
     
@@ -157,6 +252,22 @@ class PostDetailViewSet(RetrieveModelMixin,
 
         return Response({'message': 'Post saved successfully'}, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['get'])
+    def related(self, request, pk=None):
+        """
+        Similar public posts, best first, as built by `manage.py build_related_posts`.
+        """
+        # Not get_object(): looking at the related posts is not a view of the post.
+        post = get_object_or_404(self.get_queryset(), pk=pk)
+        posts = [row.related for row in RelatedPost.objects
+                 .filter(post=post, related__is_private=False)
+                 .select_related('related__owner', 'related__collection')
+                 .order_by('rank')[:get_related_size()]]
+        TaggedItem.objects.load_for(posts)
+
+        serializer_class = FastSimplePostSerializer if getattr(settings, 'BLOG_FAST_SERIALIZERS', True) else SimplePostSerializer
+        return Response(serializer_class(posts, many=True, context=self.get_serializer_context()).data)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated, IsOwnerOrReadOnly])
     def request_to_public(self, request, pk=None):
         post = self.get_object()
@@ -165,27 +276,23 @@ class PostDetailViewSet(RetrieveModelMixin,
             return Response({'message': 'Request already registerd, wait for approval.'}, status=status.HTTP_201_CREATED)
 
         post.status = Post.REQUESTED
-        post.save()
+        post.save(update_fields=['status', 'updated_at'])
         return Response({'message': 'Request registerd, we let you know soon.'}, status=status.HTTP_201_CREATED)
 
 
-class PopularPostViewSet(ListModelMixin, GenericViewSet):
+class PopularPostViewSet(FastListMixin, TaggedPageMixin, AnonymousListCacheMixin, ListModelMixin, GenericViewSet):
+    cache_namespace = 'popular'
     serializer_class = SimplePostSerializer
     pagination_class = PopularPostPagination
 
     def get_queryset(self):
         queryset = Post.objects.select_related('owner', 'collection') \
-            .filter(Q(is_private=False) | Q(owner=self.request.user)) \
-            .annotate(views=Subquery(HitCount.objects.filter(content_type=ContentType.objects.get_for_model(Post), object_pk=OuterRef('pk')).values('hits'))) \
-            .annotate(
-                ratio=Case(
-                    When(Q(views__gt=0), then=Cast('likes_count', FloatField()) / Cast('views', FloatField())),
-                    output_field=FloatField(),
-                    default=0,
-                )
-            ).order_by('-ratio')
-
-        return queryset
+            .order_by('-popularity', '-post_id')
+
+        if self.request.user.is_authenticated:
+            return queryset.filter(Q(is_private=False) | Q(owner=self.request.user))
+
+        return queryset.filter(is_private=False)
 
     def get_serializer_context(self):
         if self.request.user.is_authenticated:
@@ -196,26 +303,83 @@ class PopularPostViewSet(ListModelMixin, GenericViewSet):
         return {'request': self.request}
     
 
-class OwnPostViewSet(ListModelMixin, GenericViewSet):
+class OwnPostViewSet(FastListMixin, TaggedPageMixin, ConditionalListMixin, ListModelMixin, GenericViewSet):
     serializer_class = SimplePostSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter]
     filterset_class = OwnPostFilter
-    pagination_class = PostPagination
-    search_fields = ['title', 'description']
+    pagination_class = PostCursorPagination
 
     def get_queryset(self):
         return Post.objects.select_related('owner', 'collection') \
             .filter(owner=self.request.user) \
-            .annotate(views=Subquery(HitCount.objects.filter(content_type=ContentType.objects.get_for_model(Post), object_pk=OuterRef('pk')).values('hits'))) \
             .order_by('-created_at', '-updated_at')
+
+
+class SavedPostViewSet(ListModelMixin, GenericViewSet):
+    """
+    The user's saved posts, latest saved first. The first page also carries
+    the number of saved posts per collection for the collection filter.
+    """
+    serializer_class = SavedPostListSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = SavedPostFilter
+    pagination_class = SavedPostPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        return SavedPost.objects \
+            .filter(Q(post__is_private=False) | Q(post__owner=user), user=user) \
+            .order_by('-created_at', '-id')
+
+    def get_collection_counts(self):
+        return [{'id': row['post__collection'], 'label': row['post__collection__label'], 'count': row['count']}
+                for row in self.get_queryset()
+                    .order_by('post__collection__label')
+                    .values('post__collection', 'post__collection__label')
+                    .annotate(count=Count('pk'))]
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()) \
+            .select_related('post__owner', 'post__collection')
+        page = self.paginate_queryset(queryset)
+        load_saved_posts(page)
+        response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        if not request.query_params.get(self.paginator.cursor_query_param):
+            response.data['collections'] = self.get_collection_counts()
+        return response
     
 
-class CollectionViewSet(ListModelMixin, GenericViewSet):
+class CollectionViewSet(AnonymousListCacheMixin, ListModelMixin, GenericViewSet):
+    cache_namespace = 'collections'
     queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
 
 
-class FollowViewSet(ListModelMixin, 
+class FollowListMixin:
+    """
+    Paginate Follow rows as the users on their `user_field` side, latest
+    follow first, with the follow counters and the relationship of every
+    user to the current one.
+    """
+
+    def get_follow_list_response(self, follows, user_field):
+        page = self.paginate_queryset(follows)
+        users = []
+        for follow_row in page:
+            user = getattr(follow_row, user_field)
+            user.followed_at = follow_row.created_at
+            users.append(user)
+
+        following_ids, follower_ids = get_relationships(self.request.user, [user.pk for user in users])
+        serializer = FollowListUserSerializer(users, many=True, context={'request': self.request,
+                                                                         'following_ids': following_ids,
+                                                                         'follower_ids': follower_ids})
+        return self.get_paginated_response(serializer.data)
+
+
+class FollowViewSet(FollowListMixin,
+                      ListModelMixin, 
                       CreateModelMixin,
                       DestroyModelMixin,
                     #   RetrieveModelMixin,
@@ -227,7 +391,7 @@ class FollowViewSet(ListModelMixin,
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
-            return SimpleUserSerializer
+            return FollowListUserSerializer
         return FollowSerializer
 
     def get_serializer_context(self):
@@ -243,31 +407,27 @@ class FollowViewSet(ListModelMixin,
         if follower.id == following_user_id:
             return Response({'message': "You can't follow yourself."}, status=status.HTTP_409_CONFLICT)
         
-        if Follow.objects.filter(follower=follower, following=following_user_id).exists():
+        follow_row = follow(follower.id, following_user_id)
+        if follow_row is None:
             return Response({'message': 'You are already following this user.'}, status=status.HTTP_409_CONFLICT)
 
-        follow = Follow.objects.create(follower=follower, following_id=following_user_id)
-        serializer = self.get_serializer(follow)
+        serializer = self.get_serializer(follow_row)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def destroy(self, request, pk=None, *args, **kwargs):
-        try:
-            follow = Follow.objects.get(follower=request.user, following_id=pk)
-        except Follow.DoesNotExist:
+        if not unfollow(request.user.id, pk):
             return Response({'message': 'Follow not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        if follow.follower != request.user:
-            return Response({'message': 'You can not remove follows for other users.'}, status=status.HTTP_403_FORBIDDEN)
-
-        follow.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def list(self, request, *args, **kwargs):
-        following_id = self.get_queryset().filter(follower=self.request.user).values('following_id')
-        queryset = User.objects.filter(pk__in=following_id)
-        page = self.paginate_queryset(queryset)
-        serializer = SimpleUserSerializer(page, many=True, context={'request': request})
-        return self.get_paginated_response(serializer.data)
+        return self.get_follow_list_response(get_followings(request.user), 'following')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def mutuals(self, request):
+        """
+        The followed users who follow back, latest followed first.
+        """
+        return self.get_follow_list_response(get_mutuals(request.user), 'following')
     
     # def retrieve(self, request, *args, **kwargs):
     #     queryset = self.get_queryset()
@@ -279,7 +439,8 @@ class FollowViewSet(ListModelMixin,
     #         return Response(serializer.data)
         
 
-class FollowerViewSet(ListModelMixin, 
+class FollowerViewSet(FollowListMixin,
+                      ListModelMixin, 
                       DestroyModelMixin,
                       GenericViewSet):
     queryset = Follow.objects.all()
@@ -289,44 +450,46 @@ class FollowerViewSet(ListModelMixin,
 
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
-            return SimpleUserSerializer
+            return FollowListUserSerializer
         return FollowSerializer
 
     def get_serializer_context(self):
         return {'request': self.request}
 
     def destroy(self, request, pk=None, *args, **kwargs):
-        try:
-            follow = Follow.objects.get(follower_id=pk, following=request.user)
-        except Follow.DoesNotExist:
+        if not unfollow(pk, request.user.id):
             return Response({'message': 'Follower not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        if follow.following != request.user:
-            return Response({'message': 'Follower not found.'}, status=status.HTTP_403_FORBIDDEN)
-
-        follow.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def list(self, request, *args, **kwargs):
-        following_id = self.get_queryset().filter(following=self.request.user).values('follower')
-        queryset = User.objects.filter(pk__in=following_id)
-        page = self.paginate_queryset(queryset)
-        serializer = SimpleUserSerializer(page, many=True, context={'request': request})
-        return self.get_paginated_response(serializer.data)
+        return self.get_follow_list_response(get_followers(request.user), 'follower')
     
 
-class FollowingsPostViewSet(ListModelMixin, GenericViewSet):
+class SuggestedAuthorViewSet(ListModelMixin, GenericViewSet):
+    """
+    Authors to follow, best first, as built by `manage.py build_suggested_authors`.
+    Authors followed since the last build are left out.
+    """
+    serializer_class = SuggestedAuthorSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        return SuggestedAuthor.objects \
+            .filter(user=user) \
+            .exclude(author__in=Follow.objects.filter(follower=user).values('following')) \
+            .select_related('author') \
+            .order_by('rank')[:get_suggestions_size()]
+
+
+class FollowingsPostViewSet(FastListMixin, TaggedPageMixin, ConditionalListMixin, ListModelMixin, GenericViewSet):
     serializer_class = SimplePostSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, PostSearchFilter]
     filterset_class = PostFilter
-    pagination_class = PostPagination
+    pagination_class = TimelinePagination
     permission_classes = [IsAuthenticated]
-    search_fields = ['title', 'description']
 
     def get_queryset(self):
-        following_users_id = Follow.objects.filter(follower=self.request.user).values('following_id')
-        return Post.objects.select_related('owner', 'collection') \
-            .filter(owner_id__in=following_users_id, is_private=False) \
-            .annotate(views=Subquery(HitCount.objects.filter(content_type=ContentType.objects.get_for_model(Post), object_pk=OuterRef('pk')).values('hits'))) \
-            .order_by('-created_at', '-updated_at')
+        # Restricted to the reader's timeline by TimelinePagination.
+        return Post.objects.select_related('owner', 'collection')
     
\ No newline at end of file
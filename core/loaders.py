@@ -0,0 +1,39 @@
+"""
+Batched loading of generic relations (TaggedItem, HitCount, ...).
+
+`load_generic_related()` fetches the rows pointing at a whole list of
+objects through a content type / object id pair in one query and attaches
+them to each object, so a page costs the same number of queries whatever
+its size.
+"""
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
+
+
+def load_generic_related(objects, queryset, to_attr, fk_field='object_id', ct_field='content_type', many=True):
+    """
+    Set `to_attr` on every object of `objects` to the rows of `queryset`
+    whose `ct_field` / `fk_field` point at it: a list, or with `many=False`
+    the row or None. `objects` must all be instances of the same model.
+
+    The object id column may not have the type of the primary key (e.g. a
+    text `object_pk` for integer ids): ids are converted with the column's
+    own field when querying and compared as strings when matching.
+    Returns `objects`.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+
+    content_type = ContentType.objects.get_for_model(objects[0])
+    key_field = queryset.model._meta.get_field(fk_field)
+    keys = {key_field.to_python(obj.pk) for obj in objects}
+
+    rows = defaultdict(list)
+    for row in queryset.filter(**{ct_field: content_type, f'{fk_field}__in': keys}):
+        rows[str(getattr(row, fk_field))].append(row)
+
+    for obj in objects:
+        related = rows.get(str(obj.pk), [])
+        setattr(obj, to_attr, related if many else (related[0] if related else None))
+    return objects
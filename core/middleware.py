@@ -0,0 +1,132 @@
+"""
+Per-request instrumentation.
+
+``RequestInstrumentationMiddleware`` records the query count, DB time,
+view time, serializer time and total time of every request. It exposes them
+as a ``Server-Timing`` header and one structured log line, and logs the SQL
+of a sample of slow requests. With ``INSTRUMENTATION_ENABLED`` off the
+middleware removes itself at startup and ``timer()`` is a no-op.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, keep_sql):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timings = {}
+        self.sql = [] if keep_sql else None
+        self._running = set()
+        self.view_started = None
+        self.view_time = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += duration
+            if self.sql is not None:
+                self.sql.append({'sql': sql, 'ms': round(duration * 1000, 2)})
+
+
+@contextmanager
+def timer(name):
+    """
+    Add the time spent in the block to the `name` timing of the current
+    request. Nested blocks with the same name are only counted once.
+    """
+    metrics = _current_metrics.get()
+    if metrics is None or name in metrics._running:
+        yield
+        return
+
+    metrics._running.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._running.discard(name)
+        metrics.timings[name] = metrics.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+class RequestInstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'INSTRUMENTATION_ENABLED', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'INSTRUMENTATION_SLOW_REQUEST_MS', 500)
+        self.slow_sample_rate = getattr(settings, 'INSTRUMENTATION_SLOW_SAMPLE_RATE', 1.0)
+        self.server_timing = getattr(settings, 'INSTRUMENTATION_SERVER_TIMING', True)
+
+    def __call__(self, request):
+        # Deciding up front avoids keeping the SQL of requests that will not be sampled.
+        metrics = RequestMetrics(keep_sql=random.random() < self.slow_sample_rate)
+        token = _current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current_metrics.reset(token)
+        total = time.perf_counter() - start
+
+        timings = {
+            'db': metrics.db_time,
+            'view': metrics.view_time,
+            'serializer': metrics.timings.get('serializer'),
+            'total': total,
+        }
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={duration * 1000:.2f}' + (f';desc="{metrics.queries} queries"' if name == 'db' else '')
+                for name, duration in timings.items() if duration is not None)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in timings.items() if duration is not None},
+        }
+        logger.info(json.dumps(record))
+
+        if total * 1000 >= self.slow_request_ms and metrics.sql is not None:
+            logger.warning(json.dumps({**record, 'slow': True, 'sql': metrics.sql}))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current_metrics.get()
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # DRF responses are template responses: this runs right after the view, before rendering.
+        metrics = _current_metrics.get()
+        if metrics is not None and metrics.view_started is not None:
+            metrics.view_time = time.perf_counter() - metrics.view_started
+        return response
+
+
+def show_debug_toolbar(request):
+    """
+    debug_toolbar's default check resolves host.docker.internal on every
+    request; only compare against INTERNAL_IPS.
+    """
+    return settings.DEBUG and request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
@@ -0,0 +1,47 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:29
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_follows(apps, schema_editor):
+    User = apps.get_model('core', 'User')
+    Follow = apps.get_model('blog', 'Follow')
+
+    def count(field):
+        return Coalesce(Subquery(Follow.objects
+                                 .filter(**{field: OuterRef('pk')})
+                                 .order_by()
+                                 .values(field)
+                                 .annotate(total=Count('pk'))
+                                 .values('total')), Value(0))
+
+    User.objects.update(followers_count=count('following'), following_count=count('follower'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blog', '0019_follow_recent_indexes'),
+        ('core', '0005_user_profile_picture_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['followers_count'], name='core_user_followers_idx'),
+        ),
+        migrations.RunPython(count_follows, migrations.RunPython.noop),
+    ]
@@ -13,7 +13,11 @@ class User(AbstractUser):
     email = models.EmailField(unique=True, blank=False, null=False)
     username = models.CharField(max_length=255, unique=False, null=False, blank=False)
     profile_picture = models.ImageField(upload_to='users/profile_photo', validators=[validate_file_size], null=True, blank=True)
+    profile_picture_renditions = models.JSONField(default=dict, blank=True, editable=False)
     role = models.ForeignKey(Role, related_name='users', on_delete=models.SET_NULL, null=True, blank=True)
+    # Maintained by the Follow signals, see blog/follows.py.
+    followers_count = models.PositiveIntegerField(default=0, editable=False)
+    following_count = models.PositiveIntegerField(default=0, editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
     liked_posts = models.ManyToManyField(
@@ -22,3 +26,7 @@ class User(AbstractUser):
         blank=True
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['followers_count'], name='core_user_followers_idx'),
+        ]
@@ -1,9 +1,20 @@
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer, UserSerializer as BaseUserSerializer
+from .middleware import timer
+
+
+class TimedSerializerMixin:
+    """
+    Count the serialization time in the request's `serializer` timing.
+    """
+
+    def to_representation(self, instance):
+        with timer('serializer'):
+            return super().to_representation(instance)
 
 
 class UserSerializer(BaseUserSerializer):
     class Meta(BaseUserSerializer.Meta):
-        fields = ['id', 'username', 'email', 'profile_picture']
+        fields = ['id', 'username', 'email', 'profile_picture', 'followers_count', 'following_count']
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
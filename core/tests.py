@@ -1 +1,59 @@
-from django.test import TestCase
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from hitcount.models import HitCount
+from rest_framework.test import APITestCase
+from blog.hits import load_hit_counts
+from blog.models import Collection, Post
+from tags.models import Tag, TaggedItem
+from .models import User
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True, INSTRUMENTATION_SLOW_REQUEST_MS=0, INSTRUMENTATION_SLOW_SAMPLE_RATE=1)
+class RequestInstrumentationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', username='user', password='secret')
+        Post.objects.create(title='Title', description='Description', content='<p>Content</p>', owner=self.user,
+                            collection=Collection.objects.create(label='Tech'), is_private=False)
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_and_slow_request_log(self):
+        with self.assertLogs('core.middleware', level='INFO') as logs:
+            response = self.client.get('/blog/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for name in ('db', 'view', 'serializer', 'total'):
+            self.assertIn(f'{name};dur=', timing)
+        self.assertIn('"sql"', logs.output[-1])
+
+    @override_settings(INSTRUMENTATION_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get('/blog/')
+        self.assertNotIn('Server-Timing', response)
+
+
+class GenericLoaderTests(APITestCase):
+    def setUp(self):
+        owner = User.objects.create_user(email='owner@example.com', username='owner', password='secret')
+        collection = Collection.objects.create(label='Tech')
+        self.posts = [Post.objects.create(title=f'Post {i}', description='Description', content='<p>Content</p>',
+                                          owner=owner, collection=collection) for i in range(3)]
+        content_type = ContentType.objects.get_for_model(Post)
+        django, python = Tag.objects.create(label='django'), Tag.objects.create(label='python')
+        for tag in (django, python):
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=self.posts[0].pk)
+        TaggedItem.objects.create(tag=python, content_type=content_type, object_id=self.posts[2].pk)
+        HitCount.objects.create(content_type=content_type, object_pk=self.posts[1].pk, hits=7)
+
+    def test_one_query_per_relation(self):
+        posts = list(Post.objects.filter(pk__in=[post.pk for post in self.posts]).order_by('pk'))
+        with CaptureQueriesContext(connection) as queries:
+            TaggedItem.objects.load_for(posts)
+            load_hit_counts(posts)
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual([[item.tag.label for item in post.tagged_items] for post in posts],
+                         [['django', 'python'], [], ['python']])
+        self.assertEqual([post.hitcount and post.hitcount.hits for post in posts], [None, 7, None])
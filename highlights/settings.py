@@ -43,16 +43,16 @@ INSTALLED_APPS = [
     'corsheaders',
     'djoser',
     'django_filters',
-    'debug_toolbar',
     'hitcount',
     'rest_framework',
     'blog',
     'core',
     'tags',
+    'tasks',
 ]
 
 MIDDLEWARE = [
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
+    'core.middleware.RequestInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -73,6 +73,19 @@ INTERNAL_IPS = [
     "127.0.0.1",
 ]
 
+# debug_toolbar is a development tool only, set DEBUG_TOOLBAR=0 to leave it out
+# while DEBUG is on (e.g. when profiling).
+DEBUG_TOOLBAR = DEBUG and os.environ.get('DEBUG_TOOLBAR', '1') == '1'
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# The toolbar never shows when DEBUG is off, which is always the case in tests.
+DEBUG_TOOLBAR_CONFIG = {
+    'IS_RUNNING_TESTS': False,
+    'SHOW_TOOLBAR_CALLBACK': 'core.middleware.show_debug_toolbar',
+}
+
 ROOT_URLCONF = 'highlights.urls'
 
 TEMPLATES = [
@@ -105,6 +118,16 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -173,3 +196,97 @@ DJOSER = {
 
 CKEDITOR_UPLOAD_PATH = "blogs/"
 CKEDITOR_IMAGE_BACKEND = "pillow"
+
+# Hit counting for post detail views. When buffered, hits are collected in
+# process and written in bulk every BLOG_HITS_FLUSH_INTERVAL seconds.
+# The dedup window stays HITCOUNT_KEEP_HIT_ACTIVE (7 days by default).
+BLOG_HITS_BUFFERED = False
+BLOG_HITS_FLUSH_INTERVAL = 10
+BLOG_HITS_BUFFER_SIZE = 1000
+
+# Time decay for the /blog/popular/ score, 0 keeps the plain likes/views ratio.
+# With decay enabled schedule `manage.py refresh_popularity`.
+BLOG_POPULARITY_GRAVITY = 0
+
+# /blog/followed/ timelines: authors above the fan-out limit are merged in
+# at read time instead of being copied into every follower's timeline.
+BLOG_TIMELINE_FANOUT_LIMIT = 5000
+BLOG_TIMELINE_BACKFILL = 200
+
+# Also search the CKEditor content of posts (HTML stripped).
+# Run `manage.py rebuild_search_index` after changing it.
+BLOG_SEARCH_INCLUDE_CONTENT = False
+
+# Cache of anonymous list responses and of post detail payloads, invalidated
+# when posts or collections change. TTLs are in seconds per endpoint.
+BLOG_CACHE_ENABLED = True
+BLOG_CACHE_ALIAS = 'default'
+BLOG_CACHE_TTLS = {
+    'posts': 60,
+    'popular': 300,
+    'collections': 3600,
+    'post': 300,
+}
+
+# Rows read per database round trip by the streaming /blog/export/ endpoint.
+BLOG_EXPORT_CHUNK_SIZE = 500
+
+# Serialize the post feeds with the hand written FastSimplePostSerializer
+# instead of SimplePostSerializer (same output).
+BLOG_FAST_SERIALIZERS = True
+
+# /users/suggested/: authors kept per user by `manage.py build_suggested_authors`.
+# Posts liked by more users than BLOG_SUGGESTIONS_MAX_LIKERS are ignored for co-likes.
+BLOG_SUGGESTED_AUTHORS = 20
+BLOG_SUGGESTIONS_MAX_LIKERS = 1000
+
+# /blog/detail/<pk>/related/: posts kept per post by `manage.py build_related_posts`.
+# Tags, likers and words shared by more than BLOG_RELATED_MAX_POSTINGS posts are ignored.
+BLOG_RELATED_POSTS = 10
+BLOG_RELATED_MAX_POSTINGS = 1000
+
+# Seconds the /tags/cloud/ response is cached.
+TAGS_CLOUD_TTL = 300
+
+# Renditions of post thumbnails and profile pictures, rendered by a task after
+# upload. Lists link the `small` one.
+# Run `manage.py generate_renditions` after changing sizes or formats.
+BLOG_IMAGE_RENDITIONS = {
+    'small': (320, 320),
+    'medium': (960, 960),
+}
+BLOG_IMAGE_FORMATS = ('webp', 'jpeg')
+BLOG_IMAGE_QUALITY = 80
+
+# Post side effects (renditions, search index, timelines, popularity) run as
+# tasks from `manage.py run_tasks`. TASKS_EAGER runs them in process after the
+# commit instead, e.g. when no worker is running.
+TASKS_EAGER = False
+TASKS_RETRY_DELAY = 10
+TASKS_LOCK_TIMEOUT = 600
+
+# Per-request query count and DB / view / serializer / total time, sent as a
+# Server-Timing header and logged as JSON by the `core.middleware` logger.
+# Requests slower than INSTRUMENTATION_SLOW_REQUEST_MS are logged with their
+# SQL, for a INSTRUMENTATION_SLOW_SAMPLE_RATE fraction of requests.
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '0') == '1'
+INSTRUMENTATION_SERVER_TIMING = True
+INSTRUMENTATION_SLOW_REQUEST_MS = 500
+INSTRUMENTATION_SLOW_SAMPLE_RATE = 0.1
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.middleware': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
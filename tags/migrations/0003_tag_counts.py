@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-17 10:24
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_tagged_items(apps, schema_editor):
+    Tag = apps.get_model('tags', 'Tag')
+    TaggedItem = apps.get_model('tags', 'TaggedItem')
+    Tag.objects.update(items_count=Coalesce(Subquery(TaggedItem.objects
+                                                     .filter(tag_id=OuterRef('pk'))
+                                                     .order_by()
+                                                     .values('tag_id')
+                                                     .annotate(total=Count('pk'))
+                                                     .values('total')), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('tags', '0002_schema_performance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='items_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='taggeditem',
+            index=models.Index(fields=['tag', 'content_type'], name='tags_taggeditem_tag_ct_idx'),
+        ),
+        migrations.RunPython(count_tagged_items, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,32 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from core.loaders import load_generic_related
+
+
+class TagManager(models.Manager):
+    def refresh_counts(self, tag_ids=None, items=None):
+        """
+        Recount `items_count` from the `items` TaggedItem queryset (every
+        row by default), e.g. after bulk_create() which skips the signals
+        keeping it up to date.
+        """
+        tags = self.all() if tag_ids is None else self.filter(pk__in=tag_ids)
+        items = items if items is not None else TaggedItem.objects.all()
+        return tags.update(items_count=Coalesce(Subquery(items
+                                                         .filter(tag_id=OuterRef('pk'))
+                                                         .order_by()
+                                                         .values('tag_id')
+                                                         .annotate(total=Count('pk'))
+                                                         .values('total')), Value(0)))
 
 
 class Tag(models.Model):
+    objects = TagManager()
     label = models.CharField(max_length=255)
+    items_count = models.PositiveIntegerField(default=0)
 
     def __str__(self) -> str:
         return self.label
@@ -21,9 +43,22 @@ class TaggedItemManager(models.Manager):
                     object_id=object_id
                 )
 
+    def load_for(self, objects, to_attr='tagged_items'):
+        """
+        Attach the tagged items (with their tag) of every object of `objects`
+        as `to_attr`, in one query.
+        """
+        return load_generic_related(objects, self.select_related('tag').order_by('pk'), to_attr)
+
 class TaggedItem(models.Model):
     objects = TaggedItemManager()
     tag = models.ForeignKey(Tag, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey()
\ No newline at end of file
+    content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='tags_taggeditem_object_idx'),
+            models.Index(fields=['tag', 'content_type'], name='tags_taggeditem_tag_ct_idx'),
+        ]
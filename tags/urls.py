@@ -0,0 +1,6 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('tags/cloud/', views.TagCloudView.as_view(), name='tag-cloud'),
+]
@@ -1,3 +1,34 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .models import Tag
 
-# Create your views here.
+CLOUD_CACHE_KEY = 'tags:cloud'
+
+
+class TagCloudView(APIView):
+    """
+    The most used tags with their number of tagged public posts, `?limit=`
+    (1 to 200) tags sorted by count. Counts are kept up to date on every tag
+    change, the response is cached for TAGS_CLOUD_TTL seconds.
+    """
+    max_limit = 200
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 50)), self.max_limit))
+        except ValueError:
+            return Response({'limit': ['A valid integer is required.']}, status=status.HTTP_400_BAD_REQUEST)
+
+        key = f'{CLOUD_CACHE_KEY}:{limit}'
+        data = cache.get(key)
+        if data is None:
+            data = list(Tag.objects
+                        .filter(items_count__gt=0)
+                        .order_by('-items_count', 'label')
+                        .values('id', 'label', count=F('items_count'))[:limit])
+            cache.set(key, data, getattr(settings, 'TAGS_CLOUD_TTL', 300))
+        return Response(data)
@@ -0,0 +1,62 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from tasks import queue
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run queued tasks on a thread pool until interrupted (or once with --once).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=20, help='Tasks claimed per worker and round.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit as soon as no task is due.')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        if connection.vendor == 'sqlite':
+            # SQLite has one writer at a time: more threads only fail with "database table is locked".
+            workers = 1
+
+        def run(task_row):
+            try:
+                return queue.execute(task_row)
+            except Exception:
+                # execute() records task failures itself, this is the recording failing (e.g. a locked
+                # database). The task stays running and is requeued after TASKS_LOCK_TIMEOUT.
+                logger.exception('Task %s could not be recorded', task_row)
+                return False
+
+        def run_in_thread(task_row):
+            try:
+                return run(task_row)
+            finally:
+                connections.close_all()
+
+        succeeded = failed = 0
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tasks') if workers > 1 else None
+        try:
+            while True:
+                queue.requeue_stale()
+                claimed = queue.claim(workers * options['batch_size'])
+                if not claimed:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for ok in executor.map(run_in_thread, claimed) if executor else map(run, claimed):
+                    succeeded += ok
+                    failed += not ok
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'{succeeded} tasks done, {failed} failed.'))
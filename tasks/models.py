@@ -0,0 +1,30 @@
+from django.db import models
+
+
+class Task(models.Model):
+    PENDING = 0
+    RUNNING = 1
+    FAILED = 2
+    TASK_STATUS = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.SmallIntegerField(choices=TASK_STATUS, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'id'], name='tasks_task_due_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk}'
@@ -0,0 +1,135 @@
+"""
+A small database backed task queue.
+
+Functions decorated with ``@task`` are queued with ``.delay(**kwargs)``.
+The row is inserted when the surrounding transaction commits, so a worker
+never sees a task for data that was rolled back, and
+``manage.py run_tasks`` runs due tasks on a thread pool. Failed tasks are
+retried with an exponential backoff up to ``max_attempts`` times and then
+kept as ``FAILED`` with their traceback.
+
+With ``TASKS_EAGER`` set, tasks run in process right after the commit
+instead, which is handy without a worker (and in development).
+
+Task arguments are keyword arguments that must be JSON serializable.
+Tasks must be idempotent: a worker that dies mid task leaves it to be
+run again after ``TASKS_LOCK_TIMEOUT`` seconds.
+"""
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def is_eager():
+    return getattr(settings, 'TASKS_EAGER', False)
+
+
+class TaskFunction:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def delay(self, **kwargs):
+        """
+        Queue the task once the current transaction commits.
+        """
+        if is_eager():
+            transaction.on_commit(lambda: self.func(**kwargs), robust=True)
+        else:
+            transaction.on_commit(lambda: Task.objects.create(name=self.name, kwargs=kwargs,
+                                                              max_attempts=self.max_attempts,
+                                                              run_at=timezone.now()))
+
+    def delay_once(self, **kwargs):
+        """
+        Like `delay()`, unless the same call is already pending: one run
+        then covers every change made before it starts.
+        """
+        if is_eager():
+            return self.delay(**kwargs)
+
+        def create():
+            if not Task.objects.filter(status=Task.PENDING, name=self.name, kwargs=kwargs).exists():
+                Task.objects.create(name=self.name, kwargs=kwargs, max_attempts=self.max_attempts,
+                                    run_at=timezone.now())
+        transaction.on_commit(create)
+
+
+def task(func=None, *, max_attempts=3):
+    """
+    Register `func` as a task: `@task` or `@task(max_attempts=5)`.
+    """
+    def register(func):
+        task_function = TaskFunction(func, f'{func.__module__}.{func.__qualname__}', max_attempts)
+        registry[task_function.name] = task_function
+        return task_function
+
+    return register(func) if func is not None else register
+
+
+def get_retry_delay(attempts):
+    return timedelta(seconds=getattr(settings, 'TASKS_RETRY_DELAY', 10) * 2 ** (attempts - 1))
+
+
+def requeue_stale():
+    """
+    Put back tasks whose worker died while running them.
+    """
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'TASKS_LOCK_TIMEOUT', 600))
+    return Task.objects.filter(status=Task.RUNNING, locked_at__lt=stale_before).update(status=Task.PENDING)
+
+
+def claim(limit):
+    """
+    Mark up to `limit` due tasks as running and return them. Several workers
+    can claim concurrently: a task is only returned to the worker whose
+    UPDATE switched it from pending.
+    """
+    now = timezone.now()
+    candidates = Task.objects \
+        .filter(status=Task.PENDING, run_at__lte=now) \
+        .order_by('run_at', 'id') \
+        .values_list('pk', flat=True)[:limit]
+
+    claimed = [pk for pk in candidates
+               if Task.objects.filter(pk=pk, status=Task.PENDING)
+                              .update(status=Task.RUNNING, locked_at=now, attempts=F('attempts') + 1)]
+    return list(Task.objects.filter(pk__in=claimed).order_by('run_at', 'id'))
+
+
+def execute(task_row):
+    """
+    Run one claimed task: delete it on success, schedule a retry or mark it
+    failed otherwise. Returns True on success.
+    """
+    task_function = registry.get(task_row.name)
+    try:
+        if task_function is None:
+            raise LookupError(f'Unknown task {task_row.name}')
+        task_function.func(**task_row.kwargs)
+    except Exception:
+        logger.exception('Task %s failed (attempt %s of %s)', task_row, task_row.attempts, task_row.max_attempts)
+        changes = {'last_error': traceback.format_exc(), 'locked_at': None}
+        if task_row.attempts < task_row.max_attempts:
+            changes.update(status=Task.PENDING, run_at=timezone.now() + get_retry_delay(task_row.attempts))
+        else:
+            changes.update(status=Task.FAILED)
+        Task.objects.filter(pk=task_row.pk).update(**changes)
+        return False
+
+    Task.objects.filter(pk=task_row.pk).delete()
+    return True
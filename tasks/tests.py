@@ -0,0 +1,144 @@
+import io
+from datetime import timedelta
+from unittest import mock
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from . import queue
+from .models import Task
+from .queue import task
+
+calls = []
+
+
+@task(max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+
+@override_settings(TASKS_EAGER=False, TASKS_RETRY_DELAY=10, TASKS_LOCK_TIMEOUT=600)
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def create_task(self, task_function, status=Task.PENDING, run_at=None, **kwargs):
+        return Task.objects.create(name=task_function.name, kwargs=kwargs, status=status,
+                                   max_attempts=task_function.max_attempts, run_at=run_at or timezone.now())
+
+    def test_delay_queues_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay(value=1)
+            self.assertFalse(Task.objects.exists())
+        self.assertEqual(list(Task.objects.values_list('name', 'kwargs', 'max_attempts')),
+                         [('tasks.tests.record', {'value': 1}, 2)])
+
+    def test_delay_once_skips_pending_duplicates(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay_once(value=1)
+            record.delay_once(value=1)
+            record.delay_once(value=2)
+        self.assertEqual(sorted(Task.objects.values_list('kwargs', flat=True), key=str),
+                         [{'value': 1}, {'value': 2}])
+
+        # A running task may have read the rows already.
+        Task.objects.update(status=Task.RUNNING)
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay_once(value=1)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 1)
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager_tasks_run_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay(value=1)
+            record.delay_once(value=2)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claim_takes_due_pending_tasks(self):
+        first = self.create_task(record, value=1, run_at=timezone.now() - timedelta(seconds=5))
+        second = self.create_task(record, value=2)
+        self.create_task(record, value=3, run_at=timezone.now() + timedelta(minutes=1))
+        self.create_task(record, value=4, status=Task.FAILED)
+
+        self.assertEqual(queue.claim(1), [first])
+        claimed = queue.claim(10)
+        self.assertEqual(claimed, [second])
+        self.assertEqual((claimed[0].status, claimed[0].attempts), (Task.RUNNING, 1))
+        self.assertIsNotNone(claimed[0].locked_at)
+        self.assertEqual(queue.claim(10), [])
+
+    def test_execute_deletes_done_tasks(self):
+        self.create_task(record, value=1)
+        self.assertTrue(queue.execute(queue.claim(1)[0]))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+    def test_execute_retries_with_backoff_then_fails(self):
+        row = self.create_task(fail)
+        before = timezone.now()
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(queue.execute(queue.claim(1)[0]))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts, row.locked_at), (Task.PENDING, 1, None))
+        self.assertIn('RuntimeError: boom', row.last_error)
+        self.assertGreaterEqual(row.run_at, before + timedelta(seconds=10))
+        self.assertEqual(queue.get_retry_delay(2), timedelta(seconds=20))
+
+        Task.objects.filter(pk=row.pk).update(run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(queue.execute(queue.claim(1)[0]))
+        row.refresh_from_db()
+        self.assertEqual((row.status, row.attempts), (Task.FAILED, 2))
+
+    def test_unknown_task_fails(self):
+        Task.objects.create(name='tasks.tests.missing', max_attempts=1, run_at=timezone.now())
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertFalse(queue.execute(queue.claim(1)[0]))
+        self.assertIn('LookupError', Task.objects.get().last_error)
+
+    def test_requeue_stale(self):
+        stale = self.create_task(record, status=Task.RUNNING, value=1)
+        fresh = self.create_task(record, status=Task.RUNNING, value=2)
+        Task.objects.filter(pk=stale.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        Task.objects.filter(pk=fresh.pk).update(locked_at=timezone.now())
+
+        self.assertEqual(queue.requeue_stale(), 1)
+        self.assertEqual(dict(Task.objects.values_list('pk', 'status')),
+                         {stale.pk: Task.PENDING, fresh.pk: Task.RUNNING})
+
+
+@override_settings(TASKS_EAGER=False)
+class RunTasksCommandTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def run_tasks(self):
+        output = io.StringIO()
+        call_command('run_tasks', '--once', stdout=output)
+        return output.getvalue()
+
+    def test_runs_due_tasks(self):
+        for value in (1, 2):
+            Task.objects.create(name=record.name, kwargs={'value': value}, run_at=timezone.now())
+        Task.objects.create(name=fail.name, max_attempts=1, run_at=timezone.now())
+
+        with self.assertLogs('tasks.queue', 'ERROR'):
+            self.assertIn('2 tasks done, 1 failed.', self.run_tasks())
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(list(Task.objects.values_list('status', flat=True)), [Task.FAILED])
+
+    def test_survives_a_failure_to_record_the_outcome(self):
+        for value in (1, 2):
+            Task.objects.create(name=record.name, kwargs={'value': value}, run_at=timezone.now())
+
+        with mock.patch.object(queue, 'execute', side_effect=[OperationalError('database table is locked'), True]), \
+                self.assertLogs('tasks.management.commands.run_tasks', 'ERROR'):
+            self.assertIn('1 tasks done, 1 failed.', self.run_tasks())
+        self.assertEqual(Task.objects.filter(status=Task.RUNNING).count(), 2)